@@ -0,0 +1,176 @@
+""" API HTTP local com as métricas do dashboard em JSON
+
+    Serve as mesmas métricas das páginas do Streamlit sem executar os scripts das páginas:
+
+    - /metrics/order_metric: Pedidos por dia ( Visão Empresa )
+    - /metrics/festival_time: Tempo médio e STD de entrega com e sem festival ( Visão Restaurantes )
+    - /metrics/top_delivers: Entregadores mais rápidos ( ?order=fastest ) ou mais lentos
+      ( ?order=slowest ) por cidade ( Visão Entregadores )
+
+    Parâmetros de filtro ( iguais aos da barra lateral ):
+    - date: data limite no formato YYYY-MM-DD ( apenas pedidos anteriores a ela )
+    - traffic: condições de trânsito separadas por vírgula, ex.: Low,Jam
+
+    Cada resposta leva um ETag calculado a partir da versão do dataset e dos filtros.
+    Requisições com If-None-Match igual ao ETag atual ( comparação fraca: W/"..." também vale ) ou
+    com * recebem 304 sem recalcular a métrica. HEAD devolve só os cabeçalhos do GET.
+    Os dados vêm do mesmo snapshot das páginas ( refresh.py ), atualizado em segundo plano.
+
+    Uso:
+        python api.py --port 8000 --data train.csv
+"""
+# Libraries
+import argparse
+import hashlib
+import json
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from dataset import DATA_PATH, TRAFFIC_OPTIONS
+from refresh import get_store
+
+# Data limite padrão, a mesma do slider das páginas
+DEFAULT_DATE = datetime( 2022, 4, 13 )
+
+
+def top_delivers_metric( orders, date_limit, traffic_options, params ):
+    return orders.top_delivers( date_limit, traffic_options, top_asc=params['order'] == 'fastest' )
+
+# nome da métrica -> ( função, parâmetros extras aceitos com seus valores válidos )
+METRICS = {
+    'order_metric': ( lambda orders, date_limit, traffic_options, params: orders.orders_by_date( date_limit, traffic_options ), {} ),
+    'festival_time': ( lambda orders, date_limit, traffic_options, params: orders.festival_time_stats( date_limit, traffic_options ), {} ),
+    'top_delivers': ( top_delivers_metric, {'order': ['fastest', 'slowest']} ),
+}
+
+
+def parse_filters( query, extra ):
+    """ Esta funcao tem a responsabilidade de validar os parâmetros da query string
+
+        Input: dicionário da query string, parâmetros extras aceitos pela métrica
+        Output: data limite, lista de condições de trânsito, parâmetros extras
+        Erros: ValueError com a mensagem que volta para o cliente
+    """
+    date = query.get( 'date', [None] )[0]
+    if date is None:
+        date_limit = DEFAULT_DATE
+    else:
+        try:
+            date_limit = datetime.strptime( date, '%Y-%m-%d' )
+        except ValueError:
+            raise ValueError( 'date deve estar no formato YYYY-MM-DD' )
+
+    traffic = query.get( 'traffic', [None] )[0]
+    if traffic is None:
+        traffic_options = list( TRAFFIC_OPTIONS )
+    else:
+        traffic_options = sorted( { t.strip() for t in traffic.split( ',' ) if t.strip() } )
+        invalid = [t for t in traffic_options if t not in TRAFFIC_OPTIONS]
+        if invalid:
+            raise ValueError( 'traffic inválido: {}'.format( ', '.join( invalid ) ) )
+
+    params = {}
+    for name, valid in extra.items():
+        value = query.get( name, [valid[0]] )[0]
+        if value not in valid:
+            raise ValueError( '{} deve ser um de: {}'.format( name, ', '.join( valid ) ) )
+        params[name] = value
+
+    return date_limit, traffic_options, params
+
+def make_etag( version, metric, date_limit, traffic_options, params ):
+    key = json.dumps( [version, metric, date_limit.strftime( '%Y-%m-%d' ), sorted( traffic_options ), params], sort_keys=True )
+
+    return '"{}"'.format( hashlib.sha1( key.encode() ).hexdigest() )
+
+def etag_matches( if_none_match, etag ):
+    """ Esta funcao tem a responsabilidade de comparar o If-None-Match com o ETag atual ( RFC 7232 )
+
+        A comparação é fraca: um W/ na frente é ignorado, já que proxies podem enfraquecer o ETag.
+        O valor * vale para qualquer ETag.
+
+        Input: valor do cabeçalho If-None-Match ( ou None ), ETag atual
+        Output: True se a resposta pode ser 304
+    """
+    tags = [t.strip() for t in ( if_none_match or '' ).split( ',' ) if t.strip()]
+    if '*' in tags:
+        return True
+
+    return any( ( t[2:] if t.startswith( 'W/' ) else t ) == etag for t in tags )
+
+
+class MetricsHandler( BaseHTTPRequestHandler ):
+    store = None
+
+    def do_GET( self ):
+        self.respond( send_body=True )
+
+    def do_HEAD( self ):
+        self.respond( send_body=False )
+
+    def respond( self, send_body ):
+        url = urlparse( self.path )
+        parts = url.path.strip( '/' ).split( '/' )
+        if len( parts ) != 2 or parts[0] != 'metrics' or parts[1] not in METRICS:
+            self.send_json( 404, {'error': 'métrica não encontrada', 'metrics': sorted( METRICS )}, send_body=send_body )
+            return
+
+        metric = parts[1]
+        func, extra = METRICS[metric]
+        try:
+            date_limit, traffic_options, params = parse_filters( parse_qs( url.query, keep_blank_values=True ), extra )
+        except ValueError as e:
+            self.send_json( 400, {'error': str( e )}, send_body=send_body )
+            return
+
+        snapshot = self.store.current()
+        if snapshot is None:
+            self.send_json( 503, {'error': 'dataset indisponível'}, send_body=send_body )
+            return
+
+        etag = make_etag( snapshot.version, metric, date_limit, traffic_options, params )
+        if etag_matches( self.headers.get( 'If-None-Match' ), etag ):
+            self.send_response( 304 )
+            self.send_header( 'ETag', etag )
+            self.send_header( 'Cache-Control', 'no-cache' )
+            self.end_headers()
+            return
+
+        df_aux = func( snapshot.orders, date_limit, traffic_options, params )
+
+        body = {
+            'metric': metric,
+            'filters': {'date': date_limit.strftime( '%Y-%m-%d' ), 'traffic': traffic_options, **params},
+            'data': json.loads( df_aux.to_json( orient='records', date_format='iso' ) ),
+        }
+        self.send_json( 200, body, etag=etag, send_body=send_body )
+
+    def send_json( self, status, body, etag=None, send_body=True ):
+        payload = json.dumps( body, ensure_ascii=False ).encode( 'utf-8' )
+        self.send_response( status )
+        self.send_header( 'Content-Type', 'application/json; charset=utf-8' )
+        self.send_header( 'Content-Length', str( len( payload ) ) )
+        if etag is not None:
+            self.send_header( 'ETag', etag )
+            self.send_header( 'Cache-Control', 'no-cache' )
+        self.end_headers()
+        if send_body:
+            self.wfile.write( payload )
+
+
+def main():
+    parser = argparse.ArgumentParser( description='API local com as métricas do Curry Company Dashboard' )
+    parser.add_argument( '--host', default='127.0.0.1' )
+    parser.add_argument( '--port', type=int, default=8000 )
+    parser.add_argument( '--data', default=DATA_PATH, help='caminho do csv de pedidos' )
+    args = parser.parse_args()
+
+    MetricsHandler.store = get_store( args.data )
+    server = ThreadingHTTPServer( ( args.host, args.port ), MetricsHandler )
+    print( 'Servindo métricas em http://{}:{}/metrics/'.format( args.host, args.port ) )
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,722 @@
+# Libraries
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from dataset import DATA_PATH, dataset_version, filter_orders, load_dataset
+
+# ----------------------------------------
+# Backends de consulta dos pedidos
+# ---------------------------------------
+# As páginas e a API pedem as agregações sempre com a data limite e as condições de trânsito.
+# - PandasOrders: mantém o dataset limpo em memória e usa as funções de metrics.py
+# - PartitionedOrders: grava os pedidos em um arquivo parquet por dia e lê só os dias anteriores à
+#   data limite, aplicando as mesmas funções de metrics.py
+# - SQLiteOrders: grava os pedidos em um banco SQLite local com índices e executa as mesmas
+#   agregações como consultas parametrizadas, sem manter o dataset na memória do processo
+
+# Backend usado pelo painel e pela API: 'partitioned' ( padrão ), 'pandas' ou 'sqlite'
+BACKEND = os.environ.get( 'CURRY_BACKEND', 'partitioned' )
+
+# Pasta onde os bancos SQLite são gravados, uma subpasta por processo e um arquivo por versão do dataset
+SQLITE_DIR = os.environ.get( 'CURRY_SQLITE_DIR', os.path.join( tempfile.gettempdir(), 'curry-company' ) )
+
+# Pasta onde as partições parquet são gravadas, uma subpasta por versão do dataset dividida por todos os processos
+PARTITION_DIR = os.environ.get( 'CURRY_PARTITION_DIR', os.path.join( tempfile.gettempdir(), 'curry-company', 'partitions' ) )
+
+# Tempo ( em segundos ) sem uso depois do qual a pasta de uma versão é apagada; quem usa uma versão
+# atualiza a data da pasta a cada verificação do arquivo de dados
+PARTITION_MAX_AGE = float( os.environ.get( 'CURRY_PARTITION_MAX_AGE', '3600' ) )
+
+# Memória máxima ( em MB ) das colunas lidas que o backend particionado mantém em cache
+PARTITION_CACHE_MB = float( os.environ.get( 'CURRY_PARTITION_CACHE_MB', '64' ) )
+
+# colunas com mínimo e máximo registrados no manifesto de cada partição
+MANIFEST_STATS = ['Order_Date', 'Time_taken(min)', 'Delivery_person_Ratings', 'Delivery_person_Age']
+
+SQLITE_COLUMNS = ['ID', 'Delivery_person_ID', 'Delivery_person_Age', 'Delivery_person_Ratings',
+                  'Restaurant_latitude', 'Restaurant_longitude', 'Delivery_location_latitude',
+                  'Delivery_location_longitude', 'Order_Date', 'Weatherconditions', 'Road_traffic_density',
+                  'Vehicle_condition', 'Type_of_order', 'Type_of_vehicle', 'multiple_deliveries', 'Festival',
+                  'City', 'Time_taken(min)']
+
+# índices de uma coluna para cada filtro/agrupamento, mais um composto com os dois filtros da barra lateral,
+# que deixa o SQLite buscar só o intervalo de datas de cada condição de trânsito selecionada
+SQLITE_INDEXES = [['Order_Date'], ['Road_traffic_density'], ['City'], ['Festival'], ['Delivery_person_ID'],
+                  ['Road_traffic_density', 'Order_Date']]
+
+# acima desta fração de pedidos selecionados, o SQLite lê a tabela inteira em vez de usar o índice
+SCAN_FRACTION = 0.2
+
+# Order_Date é gravada como texto ISO, que mantém a ordem cronológica nas comparações
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# ordem das cidades usada pelo top_delivers
+CITY_ORDER = ['Metropolitian', 'Urban', 'Semi-Urban']
+
+
+def _pid_alive( pid ):
+    """ Diz se o processo pid ainda existe ( fora do POSIX, considera sempre que sim ) """
+    if os.name != 'posix':
+        return True
+
+    try:
+        os.kill( pid, 0 )
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+    return True
+
+def process_dir( base ):
+    """ Esta funcao tem a responsabilidade de devolver a pasta deste processo dentro da pasta base
+
+        O painel e a API podem rodar ao mesmo tempo com o mesmo dataset; cada processo grava e apaga
+        só os arquivos da sua pasta ( o pid ), então nenhum remove o que o outro ainda está lendo.
+        As pastas de processos que já terminaram são removidas aqui.
+
+        Input: pasta base ( SQLITE_DIR )
+        Output: caminho da pasta do processo
+    """
+    pid = os.getpid()
+    path = os.path.join( base, str( pid ) )
+    os.makedirs( path, exist_ok=True )
+
+    for name in os.listdir( base ):
+        if name.isdigit() and int( name ) != pid and not _pid_alive( int( name ) ):
+            shutil.rmtree( os.path.join( base, name ), ignore_errors=True )
+
+    return path
+
+
+class PandasOrders:
+    """ Backend em memória: filtra o dataset limpo e aplica as funções de metrics.py """
+
+    def __init__( self, df1 ):
+        self.df1 = df1
+
+    def __len__( self ):
+        return len( self.df1 )
+
+    def select( self, date_limit, traffic_options, columns=None ):
+        df1 = filter_orders( self.df1, date_limit, traffic_options )
+
+        return df1 if columns is None else df1.loc[:, columns]
+
+    def orders_by_date( self, date_limit, traffic_options ):
+        df1 = self.select( date_limit, traffic_options, ['Order_Date', 'ID'] )
+
+        return metrics.orders_by_date( df1 )
+
+    def orders_by_city_traffic( self, date_limit, traffic_options ):
+        df1 = self.select( date_limit, traffic_options, ['ID', 'City', 'Road_traffic_density'] )
+
+        return metrics.orders_by_city_traffic( df1 )
+
+    def time_by_city( self, date_limit, traffic_options ):
+        df1 = self.select( date_limit, traffic_options, ['City', 'Time_taken(min)'] )
+
+        return metrics.time_by_city( df1 )
+
+    def time_by_city_order_type( self, date_limit, traffic_options ):
+        df1 = self.select( date_limit, traffic_options, ['City', 'Type_of_order', 'Time_taken(min)'] )
+
+        return metrics.time_by_city_order_type( df1 )
+
+    def festival_time_stats( self, date_limit, traffic_options ):
+        df1 = self.select( date_limit, traffic_options, ['Festival', 'Time_taken(min)'] )
+
+        return metrics.festival_time_stats( df1 )
+
+    def top_delivers( self, date_limit, traffic_options, top_asc ):
+        df1 = self.select( date_limit, traffic_options, ['Delivery_person_ID', 'Time_taken(min)', 'City'] )
+
+        return metrics.top_delivers( df1, top_asc )
+
+    def ratings_by_deliver( self, date_limit, traffic_options ):
+        df1 = self.select( date_limit, traffic_options, ['Delivery_person_ID', 'Delivery_person_Ratings'] )
+
+        return metrics.ratings_by_deliver( df1 )
+
+    def ratings_stats( self, date_limit, traffic_options, col ):
+        df1 = self.select( date_limit, traffic_options, ['Delivery_person_Ratings', col] )
+
+        return metrics.ratings_stats( df1, col )
+
+    def orders_by_traffic( self, date_limit, traffic_options ):
+        df1 = self.select( date_limit, traffic_options, ['ID', 'Road_traffic_density'] )
+
+        return metrics.orders_by_traffic( df1 )
+
+    def orders_by_week( self, date_limit, traffic_options ):
+        df1 = self.select( date_limit, traffic_options, ['ID', 'Order_Date', 'Delivery_person_ID'] )
+
+        return metrics.orders_by_week( df1 )
+
+    def time_by_city_traffic( self, date_limit, traffic_options ):
+        df1 = self.select( date_limit, traffic_options, ['City', 'Road_traffic_density', 'Time_taken(min)'] )
+
+        return metrics.time_by_city_traffic( df1 )
+
+    def unique_delivers( self, date_limit, traffic_options ):
+        df1 = self.select( date_limit, traffic_options, ['Delivery_person_ID'] )
+
+        return metrics.unique_delivers( df1 )
+
+    def column_range( self, date_limit, traffic_options, cols ):
+        df1 = self.select( date_limit, traffic_options, list( cols ) )
+
+        return metrics.column_range( df1, list( cols ) )
+
+    def touch( self ):
+        pass
+
+    def close( self ):
+        pass
+
+
+def build_partitions( df1, path ):
+    """ Esta funcao tem a responsabilidade de gravar os pedidos limpos particionados por data do pedido
+
+        Cada dia vira um arquivo parquet, e o manifest.json guarda para cada partição a quantidade de
+        linhas, o mínimo e o máximo das colunas de MANIFEST_STATS e as condições de trânsito presentes.
+        A pasta é montada em uma pasta temporária de nome único e só então renomeada, para que ninguém
+        leia partições pela metade e duas construções ao mesmo tempo não apaguem uma a outra.
+
+        Input: Dataframe limpo, pasta das partições
+        Output: manifesto ( dicionário )
+    """
+    tmp_path = tempfile.mkdtemp( suffix='.tmp', dir=os.path.dirname( os.path.abspath( path ) ) )
+
+    try:
+        partitions = []
+        for order_date, df_aux in df1.groupby( 'Order_Date' ):
+            name = 'orders-{}.parquet'.format( order_date.strftime( '%Y-%m-%d' ) )
+            df_aux.to_parquet( os.path.join( tmp_path, name ), index=False )
+
+            partitions.append( {
+                'file': name,
+                'date': order_date.strftime( '%Y-%m-%d' ),
+                'rows': len( df_aux ),
+                'min': {c: str( df_aux[c].min() ) for c in MANIFEST_STATS},
+                'max': {c: str( df_aux[c].max() ) for c in MANIFEST_STATS},
+                'traffic': sorted( df_aux['Road_traffic_density'].unique().tolist() ),
+            } )
+
+        manifest = {'rows': len( df1 ), 'columns': list( df1.columns ), 'partitions': partitions}
+        with open( os.path.join( tmp_path, 'manifest.json' ), 'w' ) as f:
+            json.dump( manifest, f, indent=2 )
+
+        try:
+            os.rename( tmp_path, path )
+        except OSError:
+            # outra construção da mesma versão terminou antes: usa a pasta que já está pronta
+            shutil.rmtree( tmp_path, ignore_errors=True )
+            if not os.path.exists( os.path.join( path, 'manifest.json' ) ):
+                raise
+    except BaseException:
+        shutil.rmtree( tmp_path, ignore_errors=True )
+        raise
+
+    return manifest
+
+
+def prune_partitions( base, keep, max_age=PARTITION_MAX_AGE ):
+    """ Esta funcao tem a responsabilidade de apagar as pastas de versões que ninguém usa há mais de max_age segundos
+
+        Cada processo atualiza a data da pasta da versão que está servindo a cada verificação do
+        arquivo de dados ( touch ), então uma pasta parada há mais de max_age não está em uso por
+        nenhum painel ou API. Vale também para pastas temporárias de construções interrompidas.
+
+        Input: pasta base ( PARTITION_DIR ), versão que não pode ser apagada, idade máxima
+        Output: None
+    """
+    now = time.time()
+    for name in os.listdir( base ):
+        path = os.path.join( base, name )
+        if name == keep or not os.path.isdir( path ):
+            continue
+
+        try:
+            age = now - os.path.getmtime( path )
+        except OSError:
+            continue
+
+        if age > max_age:
+            shutil.rmtree( path, ignore_errors=True )
+
+
+class PartitionedOrders( PandasOrders ):
+    """ Backend em partições diárias: cada combinação de filtros lê só as partições que passam neles
+
+        A data limite do slider sempre mantém um prefixo das datas, então as partições de dias
+        posteriores nem são abertas. Das partições lidas, só vêm as linhas das condições de trânsito
+        selecionadas e só as colunas usadas pelas agregações ( as outras só quando pedidas ). Uma
+        execução das páginas faz várias agregações com os mesmos filtros, então as colunas lidas ficam
+        em um cache LRU por ( data limite, trânsito ) limitado a PARTITION_CACHE_MB.
+
+        As partições de uma versão ficam em PARTITION_DIR/<versão>, divididas entre todos os processos.
+    """
+
+    def __init__( self, path, manifest, cache_mb=PARTITION_CACHE_MB ):
+        self.path = path
+        self.manifest = manifest
+        self.cache_bytes = int( cache_mb * 1024 * 1024 )
+        self._cache = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open( cls, version ):
+        """ Esta funcao tem a responsabilidade de abrir as partições já gravadas de uma versão, sem ler o csv
+
+            Input: versão do dataset
+            Output: PartitionedOrders, ou None quando a versão ainda não foi gravada
+        """
+        path = os.path.join( PARTITION_DIR, version )
+
+        # atualiza a data antes de ler o manifesto, para que nenhum processo apague a pasta agora
+        try:
+            os.utime( path )
+            with open( os.path.join( path, 'manifest.json' ) ) as f:
+                manifest = json.load( f )
+        except FileNotFoundError:
+            return None
+
+        prune_partitions( PARTITION_DIR, version )
+
+        return cls( path, manifest )
+
+    @classmethod
+    def from_orders( cls, df1, version ):
+        os.makedirs( PARTITION_DIR, exist_ok=True )
+
+        orders = cls.open( version )
+        if orders is not None:
+            return orders
+
+        path = os.path.join( PARTITION_DIR, version )
+        manifest = build_partitions( df1, path )
+        prune_partitions( PARTITION_DIR, version )
+
+        return cls( path, manifest )
+
+    def __len__( self ):
+        return self.manifest['rows']
+
+    def partitions( self, date_limit, traffic_options ):
+        """ Esta funcao tem a responsabilidade de escolher, pelo manifesto, as partições que podem ter pedidos nos filtros
+
+            Input: data limite, lista de condições de trânsito
+            Output: lista de arquivos parquet
+        """
+        date_limit = pd.Timestamp( date_limit )
+        traffic = set( traffic_options )
+
+        return [os.path.join( self.path, p['file'] ) for p in self.manifest['partitions']
+                if pd.Timestamp( p['min']['Order_Date'] ) < date_limit and traffic.intersection( p['traffic'] )]
+
+    def read( self, date_limit, traffic_options, columns ):
+        """ Esta funcao tem a responsabilidade de ler do disco as colunas pedidas dos pedidos dentro dos filtros
+
+            Input: data limite, lista de condições de trânsito, lista de colunas
+            Output: Dataframe só com as colunas pedidas
+        """
+        files = self.partitions( date_limit, traffic_options )
+
+        # nenhuma partição selecionada: lê só o esquema de uma partição para devolver um dataframe vazio
+        if not files:
+            first = os.path.join( self.path, self.manifest['partitions'][0]['file'] )
+            return pd.read_parquet( first, columns=columns ).iloc[:0]
+
+        # as colunas dos filtros são lidas junto para aplicar a data limite, e descartadas depois
+        read_cols = list( dict.fromkeys( list( columns ) + ['Order_Date', 'Road_traffic_density'] ) )
+        df1 = pd.read_parquet( files, columns=read_cols, filters=[( 'Road_traffic_density', 'in', list( traffic_options ) )] )
+
+        return filter_orders( df1, date_limit, traffic_options ).loc[:, columns].reset_index( drop=True )
+
+    def read_all( self, columns ):
+        """ Esta funcao tem a responsabilidade de ler algumas colunas de todos os pedidos da versão, sem cache
+
+            Input: lista de colunas
+            Output: Dataframe com as colunas pedidas
+        """
+        files = [os.path.join( self.path, p['file'] ) for p in self.manifest['partitions']]
+
+        return pd.read_parquet( files, columns=columns )
+
+    def select( self, date_limit, traffic_options, columns=None ):
+        key = ( pd.Timestamp( date_limit ), tuple( sorted( traffic_options ) ) )
+        columns = list( columns or self.manifest['columns'] )
+
+        with self._lock:
+            df1 = self._cache.get( key )
+            if df1 is not None:
+                self._cache.move_to_end( key )
+
+        # na primeira leitura de uma combinação de filtros vêm de uma vez as colunas usadas pelas
+        # agregações ( cada leitura tem um custo fixo por arquivo ); as demais só quando pedidas. As
+        # partições e os filtros são os mesmos, então as linhas das colunas lidas depois vêm na mesma ordem
+        if df1 is None:
+            missing = list( dict.fromkeys( [c for c in SQLITE_COLUMNS if c in self.manifest['columns']] + columns ) )
+        else:
+            missing = [c for c in columns if c not in df1.columns]
+
+        if missing:
+            df_aux = self.read( date_limit, traffic_options, missing )
+
+            with self._lock:
+                cached = self._cache.get( key )
+                if cached is not None:
+                    # outra thread pode ter lido algumas das mesmas colunas enquanto isso
+                    df_aux = df_aux.loc[:, [c for c in df_aux.columns if c not in cached.columns]]
+                    df1 = pd.concat( [cached, df_aux], axis=1 )
+                else:
+                    df1 = df_aux
+                self._cache[key] = df1
+                self._cache.move_to_end( key )
+                self._sizes[key] = self._sizes.get( key, 0 ) + int( df_aux.memory_usage( index=False, deep=True ).sum() )
+
+                # remove as combinações usadas há mais tempo, mas nunca a que acabou de ser lida
+                while len( self._cache ) > 1 and sum( self._sizes.values() ) > self.cache_bytes:
+                    old_key, _ = self._cache.popitem( last=False )
+                    del self._sizes[old_key]
+
+        # sempre uma cópia das colunas pedidas, para que ninguém altere o dataframe guardado no cache
+        return df1.loc[:, columns]
+
+    def touch( self ):
+        """ Marca a pasta desta versão como em uso, para que o prune_partitions de outro processo não a apague """
+        try:
+            os.utime( self.path )
+        except FileNotFoundError:
+            pass
+
+    def close( self ):
+        """ Libera o cache; a pasta fica para os outros processos e é apagada pelo prune_partitions quando parar de ser usada """
+        with self._lock:
+            self._cache.clear()
+            self._sizes.clear()
+
+
+def build_database( df1, path ):
+    """ Esta funcao tem a responsabilidade de gravar os pedidos limpos em um banco SQLite com índices
+
+        O banco é montado em um arquivo temporário de nome único e só então movido para o caminho final,
+        para que ninguém abra um banco pela metade.
+
+        Input: Dataframe limpo, caminho do banco
+    """
+    # nome temporário único: duas construções ao mesmo tempo nunca escrevem ou apagam o arquivo uma da outra
+    fd, tmp_path = tempfile.mkstemp( suffix='.tmp', dir=os.path.dirname( os.path.abspath( path ) ) )
+    os.close( fd )
+
+    df_aux = df1.loc[:, SQLITE_COLUMNS].copy()
+    df_aux['Order_Date'] = df_aux['Order_Date'].dt.strftime( DATE_FORMAT )
+
+    try:
+        conn = sqlite3.connect( tmp_path )
+        try:
+            df_aux.to_sql( 'orders', conn, index=False, chunksize=10000 )
+            for cols in SQLITE_INDEXES:
+                conn.execute( 'CREATE INDEX "idx_orders_{}" ON orders ({})'.format(
+                    '_'.join( cols ), ', '.join( '"{}"'.format( c ) for c in cols ) ) )
+            conn.execute( 'ANALYZE' )
+            conn.commit()
+        finally:
+            conn.close()
+
+        os.replace( tmp_path, path )
+    except BaseException:
+        os.remove( tmp_path )
+        raise
+
+def sample_std( n, total, total_sq ):
+    """ Desvio padrão amostral ( igual ao std do pandas ) a partir de contagem, soma e soma dos quadrados """
+    n = n.astype( float )
+    with np.errstate( divide='ignore', invalid='ignore' ):
+        var = ( total_sq - total * total / n ) / ( n - 1 )
+
+    return np.sqrt( np.where( n > 1, np.maximum( var, 0 ), np.nan ) )
+
+
+class SQLiteOrders:
+    """ Backend SQLite: as agregações viram consultas parametrizadas sobre a tabela orders
+
+        Cada thread abre sua própria conexão somente leitura; o filtro de data e trânsito usa os
+        índices de Order_Date e Road_traffic_density.
+    """
+
+    def __init__( self, path, rows ):
+        self.path = path
+        self.rows = rows
+        self._local = threading.local()
+        self._counts = None
+
+    @classmethod
+    def from_orders( cls, df1, version ):
+        path = os.path.join( process_dir( SQLITE_DIR ), 'orders-{}.sqlite'.format( version ) )
+        if not os.path.exists( path ):
+            build_database( df1, path )
+
+        return cls( path, len( df1 ) )
+
+    def __len__( self ):
+        return self.rows
+
+    def _conn( self ):
+        conn = getattr( self._local, 'conn', None )
+        if conn is None:
+            conn = sqlite3.connect( Path( self.path ).resolve().as_uri() + '?mode=ro', uri=True )
+            self._local.conn = conn
+
+        return conn
+
+    def selected_fraction( self, date_limit, traffic_options ):
+        """ Esta funcao tem a responsabilidade de estimar a fração dos pedidos que passa nos filtros
+
+            Usa a contagem por dia e condição de trânsito, lida do banco uma vez ( poucas centenas de linhas ).
+
+            Input: data limite, lista de condições de trânsito
+            Output: fração entre 0 e 1
+        """
+        if self._counts is None:
+            self._counts = pd.read_sql_query( 'SELECT Order_Date, Road_traffic_density, COUNT(*) AS n FROM orders '
+                                              'GROUP BY Order_Date, Road_traffic_density', self._conn() )
+        counts = self._counts
+        selected = counts.loc[( counts['Order_Date'] < date_limit.strftime( DATE_FORMAT ) )
+                              & counts['Road_traffic_density'].isin( traffic_options ), 'n'].sum()
+
+        return selected / max( 1, self.rows )
+
+    def query( self, sql, date_limit, traffic_options, params=() ):
+        """ Esta funcao tem a responsabilidade de executar uma consulta com os filtros da barra lateral
+
+            A consulta recebe o filtro pronto no lugar de {where} e a tabela no lugar de {orders}. Quando
+            os filtros mantêm mais de SCAN_FRACTION dos pedidos, ler a tabela em sequência é mais rápido
+            que buscar linha a linha pelo índice, e a tabela vai como NOT INDEXED.
+
+            Input: SQL, data limite, lista de condições de trânsito, parâmetros extras ( depois dos filtros )
+            Output: Dataframe com o resultado
+        """
+        where = 'Order_Date < ? AND Road_traffic_density IN ({})'.format( ', '.join( '?' * len( traffic_options ) ) )
+        args = [date_limit.strftime( DATE_FORMAT )] + list( traffic_options ) + list( params )
+        table = 'orders NOT INDEXED' if self.selected_fraction( date_limit, traffic_options ) > SCAN_FRACTION else 'orders'
+
+        return pd.read_sql_query( sql.format( where=where, orders=table ), self._conn(), params=args )
+
+    def select( self, date_limit, traffic_options, columns=None ):
+        cols = ', '.join( '"{}"'.format( c ) for c in ( columns or SQLITE_COLUMNS ) )
+        df1 = self.query( 'SELECT {} FROM {{orders}} WHERE {{where}} ORDER BY rowid'.format( cols ), date_limit, traffic_options )
+        if 'Order_Date' in df1.columns:
+            df1['Order_Date'] = pd.to_datetime( df1['Order_Date'], format=DATE_FORMAT )
+
+        return df1
+
+    def orders_by_date( self, date_limit, traffic_options ):
+        df_aux = self.query( 'SELECT Order_Date, COUNT(ID) AS ID FROM {orders} WHERE {where} '
+                             'GROUP BY Order_Date ORDER BY Order_Date', date_limit, traffic_options )
+        df_aux['Order_Date'] = pd.to_datetime( df_aux['Order_Date'], format=DATE_FORMAT )
+
+        return df_aux
+
+    def orders_by_city_traffic( self, date_limit, traffic_options ):
+        return self.query( 'SELECT City, Road_traffic_density, COUNT(ID) AS ID FROM {orders} WHERE {where} '
+                           'GROUP BY City, Road_traffic_density ORDER BY City, Road_traffic_density',
+                           date_limit, traffic_options )
+
+    def _mean_std( self, value, keys, names, date_limit, traffic_options ):
+        """ Média e desvio padrão de value agrupados por keys; o std é calculado a partir das somas """
+        group = ', '.join( keys )
+        df_aux = self.query( 'SELECT {g}, COUNT("{v}") AS n, SUM("{v}") AS s, SUM("{v}" * "{v}") AS s2 '
+                             'FROM {{orders}} WHERE {{where}} GROUP BY {g} ORDER BY {g}'.format( g=group, v=value ),
+                             date_limit, traffic_options )
+        df_aux[names[0]] = df_aux['s'] / df_aux['n']
+        df_aux[names[1]] = sample_std( df_aux['n'].to_numpy(), df_aux['s'].to_numpy(), df_aux['s2'].to_numpy() )
+
+        return df_aux.drop( columns=['n', 's', 's2'] )
+
+    def time_by_city( self, date_limit, traffic_options ):
+        return self._mean_std( 'Time_taken(min)', ['City'], ['avg_time', 'std_time'], date_limit, traffic_options )
+
+    def time_by_city_order_type( self, date_limit, traffic_options ):
+        return self._mean_std( 'Time_taken(min)', ['City', 'Type_of_order'], ['avg_time', 'std_time'],
+                               date_limit, traffic_options )
+
+    def festival_time_stats( self, date_limit, traffic_options ):
+        return self._mean_std( 'Time_taken(min)', ['Festival'], ['avg_time', 'std_time'], date_limit, traffic_options )
+
+    def ratings_stats( self, date_limit, traffic_options, col ):
+        if col not in SQLITE_COLUMNS:
+            raise ValueError( 'coluna desconhecida: {}'.format( col ) )
+
+        return self._mean_std( 'Delivery_person_Ratings', ['"{}"'.format( col )], ['delivery_mean', 'delivery_std'],
+                               date_limit, traffic_options )
+
+    def orders_by_traffic( self, date_limit, traffic_options ):
+        return self.query( 'SELECT Road_traffic_density, COUNT(ID) AS ID FROM {orders} WHERE {where} '
+                           'GROUP BY Road_traffic_density ORDER BY Road_traffic_density', date_limit, traffic_options )
+
+    def orders_by_week( self, date_limit, traffic_options ):
+        # mesma semana do '%U' do pandas: ( dia do ano a partir de 0 + 7 - dia da semana com domingo = 0 ) / 7
+        week = ( "printf('%02d', ( CAST(strftime('%j', Order_Date) AS INTEGER) - 1 + 7 "
+                 "- CAST(strftime('%w', Order_Date) AS INTEGER) ) / 7)" )
+
+        return self.query( 'SELECT {w} AS week_of_year, COUNT(ID) AS ID, COUNT(DISTINCT Delivery_person_ID) AS Delivery_person_ID '
+                           'FROM {{orders}} WHERE {{where}} GROUP BY week_of_year ORDER BY week_of_year'.format( w=week ),
+                           date_limit, traffic_options )
+
+    def time_by_city_traffic( self, date_limit, traffic_options ):
+        return self._mean_std( 'Time_taken(min)', ['City', 'Road_traffic_density'], ['avg_time', 'std_time'],
+                               date_limit, traffic_options )
+
+    def unique_delivers( self, date_limit, traffic_options ):
+        df_aux = self.query( 'SELECT COUNT(DISTINCT Delivery_person_ID) AS n FROM {orders} WHERE {where}', date_limit, traffic_options )
+
+        return int( df_aux['n'].iloc[0] )
+
+    def column_range( self, date_limit, traffic_options, cols ):
+        unknown = [c for c in cols if c not in SQLITE_COLUMNS]
+        if unknown:
+            raise ValueError( 'coluna desconhecida: {}'.format( ', '.join( unknown ) ) )
+
+        aggs = ', '.join( '{f}("{c}") AS "{f}_{i}"'.format( f=f, c=c, i=i ) for i, c in enumerate( cols ) for f in ['MIN', 'MAX'] )
+        row = self.query( 'SELECT {} FROM {{orders}} WHERE {{where}}'.format( aggs ), date_limit, traffic_options ).iloc[0]
+
+        # sem pedidos o SQLite devolve NULL; to_numeric vira NaN, como no pandas
+        return pd.DataFrame( {c: pd.to_numeric( pd.Series( [row['MIN_{}'.format( i )], row['MAX_{}'.format( i )]],
+                                                           index=['min', 'max'] ) )
+                              for i, c in enumerate( cols )} )
+
+    def ratings_by_deliver( self, date_limit, traffic_options ):
+        return self.query( 'SELECT Delivery_person_ID, AVG(Delivery_person_Ratings) AS Delivery_person_Ratings '
+                           'FROM {orders} WHERE {where} GROUP BY Delivery_person_ID ORDER BY Delivery_person_ID',
+                           date_limit, traffic_options )
+
+    def top_delivers( self, date_limit, traffic_options, top_asc ):
+        direction = 'ASC' if top_asc else 'DESC'
+        sql = ( 'SELECT City, Delivery_person_ID, avg_time AS "Time_taken(min)" FROM ( '
+                '  SELECT City, Delivery_person_ID, avg_time, '
+                '         ROW_NUMBER() OVER ( PARTITION BY City ORDER BY avg_time {d}, Delivery_person_ID ) AS pos '
+                '  FROM ( SELECT City, Delivery_person_ID, AVG("Time_taken(min)") AS avg_time '
+                '         FROM {{orders}} WHERE {{where}} GROUP BY City, Delivery_person_ID ) '
+                ') WHERE pos <= 10 AND City IN (?, ?, ?) '
+                'ORDER BY CASE City WHEN ? THEN 0 WHEN ? THEN 1 ELSE 2 END, pos' ).format( d=direction )
+
+        return self.query( sql, date_limit, traffic_options, CITY_ORDER + CITY_ORDER[:2] )
+
+    def touch( self ):
+        pass
+
+    def close( self ):
+        """ Remove o arquivo do banco, que é só deste processo; conexões já abertas continuam lendo até serem fechadas """
+        try:
+            os.remove( self.path )
+        except OSError:
+            pass
+
+
+def open_backend( df1, version, backend=BACKEND ):
+    """ Esta funcao tem a responsabilidade de preparar o backend escolhido para uma versão do dataset
+
+        Input: Dataframe limpo, versão do dataset, nome do backend ( 'partitioned', 'pandas' ou 'sqlite' )
+        Output: PartitionedOrders, PandasOrders ou SQLiteOrders
+    """
+    if backend == 'sqlite':
+        return SQLiteOrders.from_orders( df1, version )
+
+    if backend == 'partitioned':
+        return PartitionedOrders.from_orders( df1, version )
+
+    if backend != 'pandas':
+        raise ValueError( 'backend desconhecido: {}'.format( backend ) )
+
+    return PandasOrders( df1 )
+
+def open_stored( version, backend=BACKEND ):
+    """ Esta funcao tem a responsabilidade de abrir uma versão já gravada por outro processo, sem ler o csv
+
+        Só o backend particionado grava as versões em uma pasta dividida entre os processos.
+
+        Input: versão do dataset, nome do backend
+        Output: PartitionedOrders, ou None quando a versão precisa ser lida e gravada
+    """
+    if backend != 'partitioned' or not os.path.isdir( PARTITION_DIR ):
+        return None
+
+    return PartitionedOrders.open( version )
+
+
+# chamadas comparadas pelo check_parity: ( método, argumentos depois dos filtros )
+PARITY_CALLS = [( 'orders_by_date', () ), ( 'orders_by_city_traffic', () ), ( 'orders_by_traffic', () ),
+                ( 'orders_by_week', () ), ( 'time_by_city', () ), ( 'time_by_city_order_type', () ),
+                ( 'time_by_city_traffic', () ), ( 'festival_time_stats', () ), ( 'top_delivers', ( True, ) ),
+                ( 'top_delivers', ( False, ) ), ( 'ratings_by_deliver', () ),
+                ( 'ratings_stats', ( 'Road_traffic_density', ) ), ( 'ratings_stats', ( 'Weatherconditions', ) ),
+                ( 'unique_delivers', () ), ( 'column_range', ( ['Delivery_person_Age', 'Vehicle_condition'], ) )]
+
+def check_parity( df1, backend, version ):
+    """ Esta funcao tem a responsabilidade de comparar um backend com o PandasOrders nas mesmas consultas
+
+        Os backends têm caminhos de código separados ( pandas e SQL ); a comparação roda todas as
+        agregações de PARITY_CALLS com datas no início, no meio e depois do período e com todas,
+        uma ou nenhuma condição de trânsito.
+
+        Input: Dataframe limpo, nome do backend, versão usada nos arquivos do backend
+        Output: lista de diferenças encontradas ( vazia quando os resultados batem )
+    """
+    expected = PandasOrders( df1 )
+    orders = open_backend( df1, version, backend )
+
+    first, last = df1['Order_Date'].min(), df1['Order_Date'].max()
+    dates = [first, first + ( last - first ) / 2, last + pd.Timedelta( days=1 )]
+    traffics = [sorted( df1['Road_traffic_density'].unique() ), [df1['Road_traffic_density'].iloc[0]], []]
+
+    errors = []
+    try:
+        for date_limit in dates:
+            for traffic_options in traffics:
+                for method, args in PARITY_CALLS:
+                    left = getattr( expected, method )( date_limit, traffic_options, *args )
+                    right = getattr( orders, method )( date_limit, traffic_options, *args )
+                    try:
+                        if isinstance( left, pd.DataFrame ):
+                            pd.testing.assert_frame_equal( left, right, check_dtype=False, check_index_type=False )
+                        elif left != right:
+                            raise AssertionError( '{} != {}'.format( left, right ) )
+                    except AssertionError as e:
+                        errors.append( '{}{} em {:%Y-%m-%d} {}: {}'.format( method, args, date_limit, traffic_options, e ) )
+    finally:
+        orders.close()
+
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser( description='Confere se um backend devolve as mesmas agregações do pandas' )
+    parser.add_argument( '--data', default=DATA_PATH, help='caminho do csv de pedidos' )
+    parser.add_argument( '--backend', default='sqlite', help='backend comparado com o pandas ( sqlite ou partitioned )' )
+    args = parser.parse_args()
+
+    errors = check_parity( load_dataset( args.data ), args.backend, dataset_version( args.data ) )
+    for e in errors:
+        print( e )
+    print( '{}: {}'.format( args.backend, 'ok' if not errors else '{} diferenças'.format( len( errors ) ) ) )
+
+    raise SystemExit( 1 if errors else 0 )
+
+
+if __name__ == '__main__':
+    main()
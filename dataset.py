@@ -0,0 +1,108 @@
+# Libraries
+import hashlib
+import os
+
+import pandas as pd
+
+# Caminho do dataset usado pelas páginas e pela API
+DATA_PATH = os.environ.get( 'CURRY_DATA_PATH', 'train.csv' )
+
+# Opções do filtro de trânsito exibidas nas páginas
+TRAFFIC_OPTIONS = ['Low', 'Medium', 'High', 'Jam']
+
+
+def clean_code( df1 ):
+    """" Esta funcao tem a responsabilidade de limpar o dataframe
+
+        Tipos de limpeza:
+        1. Remoção dos dados NaN
+        2. Mudança do tipo da coluna de dados
+        3. Remoção dos espaços das variáveis de texto
+        4. Formatação da coluna de datas
+        5. Limpeza da coluna de tempo ( remoção do texto da variável numérica )
+
+        Input: Dataframe
+        Output: Dataframe
+    """
+    #1. convertendo a coluna Age de texto para numero
+    linhas_selecionadas = (df1['Delivery_person_Age'] != 'NaN ')
+    df1 = df1.loc[linhas_selecionadas, :].copy()
+    df1['Delivery_person_Age'] = df1['Delivery_person_Age'].astype( int )
+
+    linhas_selecionadas = (df1['City'] != 'NaN ')
+    df1 = df1.loc[linhas_selecionadas, :].copy()
+
+    linhas_selecionadas = (df1['Road_traffic_density'] != 'NaN ')
+    df1 = df1.loc[linhas_selecionadas, :].copy()
+
+    linhas_selecionadas = (df1['Festival'] != 'NaN ')
+    df1 = df1.loc[linhas_selecionadas, :].copy()
+
+    #2. convertendo a coluna Ratings de texto para numero decimal ( float )
+    df1['Delivery_person_Ratings'] = df1['Delivery_person_Ratings'].astype( float )
+
+    #3. convertendo a coluna order_date de texto para data
+    df1['Order_Date'] = pd.to_datetime(df1['Order_Date'], format = '%d-%m-%Y' )
+
+    #4. convertendo multiple_deliveries de texto para numero inteiro ( int )
+    linhas_selecionadas = (df1['multiple_deliveries'] != 'NaN ')
+    df1 = df1.loc[linhas_selecionadas, :].copy()
+    df1['multiple_deliveries'] = df1['multiple_deliveries'].astype( int )
+
+    #6. removendo os espacos dentro de strings/texto/object
+    df1.loc[:, 'ID'] = df1.loc[:, 'ID'].str.strip()
+    df1.loc[:, 'Road_traffic_density'] = df1.loc[:, 'Road_traffic_density'].str.strip()
+    df1.loc[:, 'Type_of_order'] = df1.loc[:, 'Type_of_order'].str.strip()
+    df1.loc[:, 'Type_of_vehicle'] = df1.loc[:, 'Type_of_vehicle'].str.strip()
+    df1.loc[:, 'City'] = df1.loc[:, 'City'].str.strip()
+    df1.loc[:, 'Festival'] = df1.loc[:, 'Festival'].str.strip()
+
+    #7. Limpando a coluna de time taken
+    df1['Time_taken(min)'] = df1['Time_taken(min)'].apply( lambda x: x.split( '(min)' )[1] )
+    df1['Time_taken(min)'] = df1['Time_taken(min)'].astype(int)
+
+    return df1
+
+def load_dataset( path=DATA_PATH ):
+    """ Esta funcao tem a responsabilidade de ler o csv de pedidos e devolver o dataframe já limpo
+
+        Input: caminho do csv
+        Output: Dataframe
+    """
+    df = pd.read_csv( path )
+
+    return clean_code( df )
+
+def dataset_version( path=DATA_PATH ):
+    """ Esta funcao tem a responsabilidade de identificar a versão atual do dataset
+
+        A versão muda sempre que o arquivo é substituído ou alterado ( tamanho ou data de modificação ),
+        sem precisar ler o conteúdo do arquivo.
+
+        Input: caminho do csv
+        Output: string com a versão
+    """
+    stat = os.stat( path )
+    key = '{}:{}:{}'.format( os.path.abspath( path ), stat.st_size, stat.st_mtime_ns )
+
+    return hashlib.sha1( key.encode() ).hexdigest()[:16]
+
+def filter_orders( df1, date_limit, traffic_options ):
+    """ Esta funcao tem a responsabilidade de aplicar os filtros da barra lateral
+
+        Filtros:
+        1. Pedidos anteriores à data limite
+        2. Pedidos com as condições de trânsito selecionadas
+
+        Input: Dataframe limpo, data limite, lista de condições de trânsito
+        Output: Dataframe filtrado
+    """
+    # Filtro de data
+    linhas_selecionadas = df1['Order_Date'] < date_limit
+    df1 = df1.loc[linhas_selecionadas, :]
+
+    # Filtro de trânsito
+    linhas_selecionadas = df1['Road_traffic_density'].isin( traffic_options )
+    df1 = df1.loc[linhas_selecionadas, :]
+
+    return df1
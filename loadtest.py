@@ -0,0 +1,380 @@
+""" Teste de carga do dashboard com várias sessões simultâneas
+
+    Gera um dataset sintético no mesmo formato do train.csv, abre N sessões simultâneas com a Home e
+    as páginas reais usando a API de testes do Streamlit ( streamlit.testing.v1.AppTest ) e, em cada
+    sessão, executa de novo páginas sorteadas trocando a data limite e as condições de trânsito de
+    forma aleatória. No fim mostra:
+
+    - p50 e p95 do tempo de cada nova execução ( rerun ), no geral e por página
+    - pico de memória ( RSS ) de cada processo e a soma de todos
+    - memória de cada processo em quatro partes: interpretador e Streamlit, dados carregados, custo
+      da primeira execução de cada página ( aquecimento ) e crescimento durante as execuções da sessão
+
+    Cada sessão roda em um processo próprio. O AppTest cria e desmonta o Runtime global do Streamlit
+    a cada execução, então duas instâncias em threads do mesmo processo derrubam uma à outra. Por
+    isso a memória medida é por processo, e não por sessão dentro do servidor: no servidor todas as
+    sessões dividem o interpretador e um único snapshot dos dados. Antes da medida, cada processo
+    executa cada página uma vez em uma instância descartada, para que imports tardios, templates do
+    plotly e caches dos filtros padrão não entrem no crescimento da sessão. A estimativa para o
+    servidor soma a base, os dados e o aquecimento uma vez e o crescimento uma vez por sessão; ainda
+    é um limite superior, porque os caches dos filtros sorteados também são compartilhados no servidor.
+
+    Uso:
+        python loadtest.py --sessions 8 --reruns 10 --rows 50000
+        python loadtest.py --sessions 16 --backend sqlite --json resultado.json
+        python loadtest.py --sessions 4 --pages pages/2_visao_entregadores.py --keep
+"""
+# Libraries
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from queue import Empty
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname( os.path.abspath( __file__ ) )
+
+PAGES = ['Home.py', 'pages/1_visao_empresa.py', 'pages/2_visao_entregadores.py', 'pages/3_visao_restaurantes.py']
+
+# mesmo intervalo do slider das páginas
+MIN_DATE = datetime( 2022, 2, 11 )
+MAX_DATE = datetime( 2022, 4, 6 )
+
+TRAFFIC = ['Low', 'Medium', 'High', 'Jam']
+
+
+def make_dataset( rows, couriers, path, seed=42 ):
+    """ Esta funcao tem a responsabilidade de gerar um csv sintético no formato do train.csv
+
+        Os valores seguem o formato bruto do arquivo original ( espaços no fim dos textos, 'NaN ' para
+        valores ausentes, '(min) 24' no tempo de entrega ) para passar pelo mesmo clean_code.
+
+        Input: quantidade de linhas, quantidade de entregadores, caminho do csv, semente
+    """
+    rng = np.random.default_rng( seed )
+    days = ( MAX_DATE - MIN_DATE ).days + 1
+
+    def pick( values, nan=0.0 ):
+        col = rng.choice( np.array( values, dtype=object ), rows )
+        if nan:
+            col[rng.random( rows ) < nan] = 'NaN '
+        return col
+
+    courier_ids = np.array( ['CITY{:02d}RES{:02d}DEL{:02d} '.format( i % 22, i // 22 % 20, i // 440 ) for i in range( couriers )], dtype=object )
+    dates = pd.Timestamp( MIN_DATE ) + pd.to_timedelta( rng.integers( 0, days, rows ), unit='D' )
+
+    df = pd.DataFrame( {
+        'ID': ['0x{:06x} '.format( i ) for i in range( rows )],
+        'Delivery_person_ID': courier_ids[rng.integers( 0, couriers, rows )],
+        'Delivery_person_Age': pick( [str( a ) for a in range( 20, 40 )], nan=0.01 ),
+        'Delivery_person_Ratings': np.round( rng.uniform( 2.5, 5.0, rows ), 1 ).astype( str ),
+        'Restaurant_latitude': 22.7 + rng.random( rows ) / 10,
+        'Restaurant_longitude': 75.8 + rng.random( rows ) / 10,
+        'Delivery_location_latitude': 22.7 + rng.random( rows ) / 10,
+        'Delivery_location_longitude': 75.8 + rng.random( rows ) / 10,
+        'Order_Date': dates.strftime( '%d-%m-%Y' ),
+        'Time_Orderd': '11:30:00',
+        'Time_Order_picked': '11:45:00',
+        'Weatherconditions': pick( ['conditions Sunny', 'conditions Stormy', 'conditions Fog',
+                                    'conditions Cloudy', 'conditions Windy', 'conditions Sandstorms'] ),
+        'Road_traffic_density': pick( [t + ' ' for t in TRAFFIC], nan=0.01 ),
+        'Vehicle_condition': rng.integers( 0, 4, rows ),
+        'Type_of_order': pick( ['Snack ', 'Meal ', 'Drinks ', 'Buffet '] ),
+        'Type_of_vehicle': pick( ['motorcycle ', 'scooter ', 'electric_scooter '] ),
+        'multiple_deliveries': pick( ['0', '1', '2', '3'], nan=0.02 ),
+        'Festival': pick( ['No ', 'No ', 'No ', 'Yes '], nan=0.005 ),
+        'City': pick( ['Metropolitian ', 'Urban ', 'Semi-Urban '], nan=0.01 ),
+        'Time_taken(min)': ['(min) {}'.format( t ) for t in rng.integers( 10, 55, rows )],
+    } )
+    df.to_csv( path, index=False )
+
+def current_rss_kb():
+    """ RSS atual do processo em KB ( Linux: /proc/self/status; nos demais, o pico do getrusage ) """
+    try:
+        with open( '/proc/self/status' ) as f:
+            for line in f:
+                if line.startswith( 'VmRSS:' ):
+                    return int( line.split()[1] )
+    except OSError:
+        pass
+
+    return peak_rss_kb()
+
+def peak_rss_kb():
+    peak = resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss
+
+    # no macOS o ru_maxrss vem em bytes
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+def random_filters( rng ):
+    date_limit = MIN_DATE + timedelta( days=rng.randint( 0, ( MAX_DATE - MIN_DATE ).days ) )
+    traffic = rng.sample( TRAFFIC, rng.randint( 1, len( TRAFFIC ) ) )
+
+    return date_limit, traffic
+
+
+def run_session( session_id, pages, reruns, think, seed, timeout, barrier, queue ):
+    """ Esta funcao tem a responsabilidade de simular uma sessão: abrir as páginas e mudar os filtros várias vezes
+
+        Roda em um processo próprio. A sessão abre todas as páginas, como quem navega pelo painel, e a
+        cada rerun escolhe uma delas: nas que têm filtros, muda a data limite ou o trânsito antes de
+        executar; na Home, só executa de novo. Cada execução é cronometrada como
+        ( sessão, página, tipo, segundos, erro ) e, no fim, a lista vai para a fila junto com a memória
+        do processo.
+    """
+    # as páginas importam os módulos da raiz e abrem o logo.png pelo caminho relativo
+    sys.path.insert( 0, ROOT )
+    os.chdir( ROOT )
+
+    # importa antes da primeira medida tudo o que as páginas importam, para não contar como memória da sessão
+    import folium
+    import haversine
+    import plotly.express
+    import streamlit_folium
+    from streamlit.testing.v1 import AppTest
+    from refresh import get_store
+
+    rng = random.Random( seed + session_id )
+    results = []
+
+    # memória do processo sem os dados, depois com os dados carregados
+    start_rss = current_rss_kb()
+    start = time.perf_counter()
+    get_store().current()
+    load_seconds = time.perf_counter() - start
+    data_rss = current_rss_kb()
+
+    # aquecimento: a primeira execução de cada página tem custos de uma vez por processo, que no
+    # servidor também são divididos; só o que vier depois desta medida conta como estado da sessão
+    try:
+        for page in pages:
+            AppTest.from_file( os.path.join( ROOT, page ), default_timeout=timeout ).run()
+    except Exception as e:
+        print( 'Sessão {}: aquecimento falhou, o crescimento inclui a primeira execução: {!r}'.format( session_id, e ) )
+    warm_rss = current_rss_kb()
+
+    apps = {page: AppTest.from_file( os.path.join( ROOT, page ), default_timeout=timeout ) for page in pages}
+
+    try:
+        barrier.wait( timeout )
+
+        for page, at in apps.items():
+            start = time.perf_counter()
+            at.run()
+            results.append( ( session_id, page, 'first', time.perf_counter() - start, bool( at.exception ) ) )
+
+        for _ in range( reruns ):
+            if think:
+                time.sleep( rng.uniform( 0, think ) )
+
+            page = rng.choice( pages )
+            at = apps[page]
+
+            date_limit, traffic = random_filters( rng )
+            if at.sidebar.slider and rng.random() < 0.5:
+                at.sidebar.slider[0].set_value( date_limit )
+            elif at.sidebar.multiselect:
+                at.sidebar.multiselect[0].set_value( traffic )
+
+            start = time.perf_counter()
+            at.run()
+            results.append( ( session_id, page, 'rerun', time.perf_counter() - start, bool( at.exception ) ) )
+    except Exception as e:
+        # falha fora do script da página ( ex.: timeout do AppTest, outra sessão morreu antes da largada ):
+        # conta como erro e encerra a sessão
+        results.append( ( session_id, None, 'failed', 0.0, True ) )
+        print( 'Sessão {} falhou: {!r}'.format( session_id, e ) )
+
+    queue.put( {
+        'session': session_id,
+        'results': results,
+        'load_seconds': load_seconds,
+        'start_rss_kb': start_rss,
+        'data_rss_kb': data_rss,
+        'warm_rss_kb': warm_rss,
+        'rss_kb': current_rss_kb(),
+        'peak_rss_kb': peak_rss_kb(),
+    } )
+
+def collect( procs, queue, deadline ):
+    """ Esta funcao tem a responsabilidade de receber o relatório de cada sessão sem travar
+
+        Uma sessão que morre ( ex.: falta de memória ) não manda relatório; a espera termina quando
+        todas mandaram, quando nenhum processo está mais vivo ou no prazo final.
+
+        Input: processos das sessões, fila, prazo final ( time.monotonic )
+        Output: lista de relatórios recebidos
+    """
+    sessions = []
+    while len( sessions ) < len( procs ) and time.monotonic() < deadline:
+        try:
+            sessions.append( queue.get( timeout=1 ) )
+            continue
+        except Empty:
+            pass
+
+        if not any( p.is_alive() for p in procs ):
+            # um processo que termina já entregou o que mandou; esvazia a fila e para de esperar
+            try:
+                while len( sessions ) < len( procs ):
+                    sessions.append( queue.get( timeout=1 ) )
+            except Empty:
+                pass
+            break
+
+    return sessions
+
+def summarize( results ):
+    df = pd.DataFrame( results, columns=['session', 'page', 'kind', 'seconds', 'error'] )
+    reruns = df.loc[df['kind'] == 'rerun', :]
+
+    def stats( df_aux ):
+        return {
+            'runs': int( len( df_aux ) ),
+            'p50_ms': round( float( np.percentile( df_aux['seconds'], 50 ) ) * 1000, 1 ) if len( df_aux ) else None,
+            'p95_ms': round( float( np.percentile( df_aux['seconds'], 95 ) ) * 1000, 1 ) if len( df_aux ) else None,
+        }
+
+    return {
+        'rerun': stats( reruns ),
+        'first_run': stats( df.loc[df['kind'] == 'first', :] ),
+        'by_page': {page: stats( df_aux ) for page, df_aux in reruns.groupby( 'page' )},
+        'errors': int( df['error'].sum() ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser( description='Teste de carga do Curry Company Dashboard com sessões simultâneas' )
+    parser.add_argument( '--sessions', type=int, default=8, help='quantidade de sessões simultâneas' )
+    parser.add_argument( '--reruns', type=int, default=10, help='reruns por sessão, cada um em uma página sorteada' )
+    parser.add_argument( '--rows', type=int, default=50000, help='linhas do dataset sintético' )
+    parser.add_argument( '--couriers', type=int, default=None, help='entregadores distintos ( padrão: rows / 20 )' )
+    parser.add_argument( '--pages', nargs='+', default=PAGES, help='páginas abertas em cada sessão' )
+    parser.add_argument( '--backend', default=None, help='CURRY_BACKEND usado no teste ( partitioned, pandas ou sqlite )' )
+    parser.add_argument( '--think', type=float, default=0.0, help='pausa máxima ( s ) entre os reruns' )
+    parser.add_argument( '--timeout', type=float, default=120.0, help='tempo máximo ( s ) de cada execução da página e da largada' )
+    parser.add_argument( '--seed', type=int, default=42 )
+    parser.add_argument( '--json', default=None, help='grava o relatório neste arquivo' )
+    parser.add_argument( '--keep', action='store_true', help='mantém a pasta temporária com o csv e os arquivos dos backends' )
+    args = parser.parse_args()
+    json_path = os.path.abspath( args.json ) if args.json else None
+
+    workdir = tempfile.mkdtemp( prefix='curry-loadtest-' )
+    try:
+        report = run( args, workdir )
+    finally:
+        if args.keep:
+            print( 'Arquivos mantidos em {}'.format( workdir ) )
+        else:
+            shutil.rmtree( workdir, ignore_errors=True )
+
+    if json_path:
+        with open( json_path, 'w' ) as f:
+            json.dump( report, f, indent=2, ensure_ascii=False )
+
+def run( args, workdir ):
+    """ Esta funcao tem a responsabilidade de gerar o dataset, rodar as sessões e montar o relatório
+
+        Input: argumentos da linha de comando, pasta temporária do teste
+        Output: relatório ( dicionário )
+    """
+    data_path = os.path.join( workdir, 'train.csv' )
+
+    print( 'Gerando dataset sintético com {} linhas em {}'.format( args.rows, data_path ) )
+    make_dataset( args.rows, args.couriers or max( 1, args.rows // 20 ), data_path, args.seed )
+
+    # as páginas leem a configuração no primeiro import dos módulos; os processos das sessões herdam o ambiente
+    os.environ['CURRY_DATA_PATH'] = data_path
+    os.environ['CURRY_SQLITE_DIR'] = os.path.join( workdir, 'sqlite' )
+    os.environ['CURRY_PARTITION_DIR'] = os.path.join( workdir, 'partitions' )
+    if args.backend:
+        os.environ['CURRY_BACKEND'] = args.backend
+
+    ctx = multiprocessing.get_context( 'spawn' )
+    barrier = ctx.Barrier( args.sessions + 1 )
+    queue = ctx.Queue()
+    procs = [ctx.Process( target=run_session,
+                          args=( i, args.pages, args.reruns, args.think, args.seed, args.timeout, barrier, queue ) )
+             for i in range( args.sessions )]
+    for p in procs:
+        p.start()
+
+    print( 'Abrindo {} sessões com {} reruns cada...'.format( args.sessions, args.reruns ) )
+    try:
+        barrier.wait( args.timeout )
+    except threading.BrokenBarrierError:
+        print( 'Nem todas as sessões chegaram à largada em {}s'.format( args.timeout ) )
+    start = time.perf_counter()
+
+    # cada sessão roda a primeira execução de cada página e os reruns, cada um com até --timeout
+    deadline = time.monotonic() + args.timeout * ( len( args.pages ) + args.reruns + 1 )
+    sessions = collect( procs, queue, deadline )
+    elapsed = time.perf_counter() - start
+
+    for p in procs:
+        p.join( 5 )
+        if p.is_alive():
+            p.terminate()
+
+    missing = args.sessions - len( sessions )
+    if missing:
+        print( '{} sessões terminaram sem relatório ( processo morto ou travado )'.format( missing ) )
+
+    results = [r for s in sessions for r in s['results']]
+
+    def mean_mb( values ):
+        return round( float( np.mean( values ) ) / 1024, 1 ) if values else None
+
+    report = summarize( results )
+    report['errors'] += missing
+    report.update( {
+        'sessions': args.sessions,
+        'sessions_reported': len( sessions ),
+        'reruns_per_session': args.reruns,
+        'pages': args.pages,
+        'rows': args.rows,
+        'backend': os.environ.get( 'CURRY_BACKEND', 'padrão' ),
+        'load_seconds': round( float( np.mean( [s['load_seconds'] for s in sessions] ) ), 2 ) if sessions else None,
+        'elapsed_seconds': round( elapsed, 2 ),
+        'peak_rss_mb': round( max( s['peak_rss_kb'] for s in sessions ) / 1024, 1 ) if sessions else None,
+        'total_peak_rss_mb': round( sum( s['peak_rss_kb'] for s in sessions ) / 1024, 1 ),
+        'process_base_mb': mean_mb( [s['start_rss_kb'] for s in sessions] ),
+        'data_mb': mean_mb( [max( 0, s['data_rss_kb'] - s['start_rss_kb'] ) for s in sessions] ),
+        'warmup_mb': mean_mb( [max( 0, s['warm_rss_kb'] - s['data_rss_kb'] ) for s in sessions] ),
+        'session_growth_mb': mean_mb( [max( 0, s['rss_kb'] - s['warm_rss_kb'] ) for s in sessions] ),
+    } )
+
+    # no servidor, todas as sessões dividem um processo e um snapshot: base, dados e aquecimento uma vez, crescimento por sessão
+    if sessions:
+        report['server_estimate_mb'] = round( report['process_base_mb'] + report['data_mb'] + report['warmup_mb']
+                                              + args.sessions * report['session_growth_mb'], 1 )
+
+    print()
+    print( 'Reruns: {runs}  p50 {p50_ms} ms  p95 {p95_ms} ms'.format( **report['rerun'] ) )
+    print( 'Primeira execução: p50 {p50_ms} ms  p95 {p95_ms} ms'.format( **report['first_run'] ) )
+    for page, stats in report['by_page'].items():
+        print( '  {:<32} p50 {:>8} ms  p95 {:>8} ms  ( {} reruns )'.format( page, stats['p50_ms'], stats['p95_ms'], stats['runs'] ) )
+    if sessions:
+        print( 'Memória por processo de sessão ( média ): {process_base_mb} MB do interpretador e do Streamlit, '
+               '+{data_mb} MB dos dados, +{warmup_mb} MB da primeira execução das páginas, '
+               '+{session_growth_mb} MB nas execuções da sessão'.format( **report ) )
+        print( 'Pico de RSS por processo: {peak_rss_mb} MB  ( soma dos processos: {total_peak_rss_mb} MB )'.format( **report ) )
+        print( 'Estimativa para um servidor com {sessions} sessões e um snapshot compartilhado: '
+               'até {server_estimate_mb} MB'.format( **report ) )
+    print( 'Tempo total: {elapsed_seconds}s  Erros: {errors}'.format( **report ) )
+
+    return report
+
+
+if __name__ == '__main__':
+    main()
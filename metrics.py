@@ -0,0 +1,180 @@
+# Libraries
+import pandas as pd
+
+# ----------------------------------------
+# Métricas compartilhadas entre as páginas e a API
+# ---------------------------------------
+
+def orders_by_date( df1 ):
+    """ Esta funcao tem a responsabilidade de agrupar os pedidos por data e realizar a contagem
+
+        Input: Dataframe
+        Output: Dataframe com as colunas Order_Date e ID ( quantidade de pedidos )
+    """
+    # colunas
+    cols = ['Order_Date', 'ID']
+
+    # selecao de linhas
+    df_aux = df1.loc[:, cols].groupby('Order_Date').count().reset_index()
+
+    return df_aux
+
+def festival_time_stats( df1 ):
+    """ Esta funcao tem a responsabilidade de calcular o tempo médio e o desvio padrão de entrega
+        com e sem festival
+
+        Input: Dataframe
+        Output: Dataframe com as colunas Festival, avg_time e std_time
+    """
+    df_aux = ( df1.loc[:, ['Festival', 'Time_taken(min)']]
+                  .groupby('Festival')
+                  .agg({'Time_taken(min)' : ['mean', 'std']} ) )
+
+    df_aux.columns = ['avg_time', 'std_time']
+    df_aux = df_aux.reset_index()
+
+    return df_aux
+
+def top_delivers( df1, top_asc ):
+    """ Esta funcao tem a responsabilidade de exibir um dataframe com a média dos entregadores mais rápidos e mais lentos
+
+        Passos:
+        1. Seleção das colunas
+        2. Agrupamento
+        3. Aplicação da função
+        4. Filtragem
+        5. Junção dos dados
+        6. Exibição do DataFrame
+
+    """
+    df2 = ( df1.loc[:, ['Delivery_person_ID','Time_taken(min)' ,'City']]
+             .groupby(['City', 'Delivery_person_ID'])
+             .mean()
+             .sort_values(['City','Time_taken(min)'], ascending = top_asc).reset_index() )
+
+    df_aux01 = df2.loc[df2['City'] == 'Metropolitian', :].head(10)
+    df_aux02 = df2.loc[df2['City'] == 'Urban', :].head(10)
+    df_aux03 = df2.loc[df2['City'] == 'Semi-Urban', :].head(10)
+
+    df3 = pd.concat([df_aux01, df_aux02, df_aux03]).reset_index( drop=True )
+
+    return df3
+
+def ratings_by_deliver( df1 ):
+    """ Esta funcao tem a responsabilidade de calcular a avaliação média de cada entregador
+
+        Input: Dataframe
+        Output: Dataframe com as colunas Delivery_person_ID e Delivery_person_Ratings ( média )
+    """
+    df_aux = ( df1.loc[:, ['Delivery_person_ID','Delivery_person_Ratings']]
+                  .groupby(['Delivery_person_ID'])
+                  .mean()
+                  .reset_index() )
+
+    return df_aux
+
+def time_by_city_order_type( df1 ):
+    """ Esta funcao tem a responsabilidade de calcular o tempo médio e o desvio padrão de entrega
+        por cidade e tipo de pedido
+
+        Input: Dataframe
+        Output: Dataframe com as colunas City, Type_of_order, avg_time e std_time
+    """
+    df_aux = ( df1.loc[:, ['City', 'Type_of_order','Time_taken(min)']]
+                  .groupby(['City', 'Type_of_order'])
+                  .agg({'Time_taken(min)' : ['mean', 'std']} ) )
+    df_aux.columns = ['avg_time', 'std_time']
+    df_aux = df_aux.reset_index()
+
+    return df_aux
+
+def orders_by_city_traffic( df1 ):
+    """ Esta funcao tem a responsabilidade de agrupar os pedidos por tipo de cidade e densidade de trânsito e realizar a contagem
+
+        Input: Dataframe
+        Output: Dataframe com as colunas City, Road_traffic_density e ID ( quantidade de pedidos )
+    """
+    df_aux = df1.loc[:, ['ID', 'City','Road_traffic_density']].groupby(['City','Road_traffic_density']).count().reset_index()
+
+    return df_aux
+
+def time_by_city( df1 ):
+    """ Esta funcao tem a responsabilidade de calcular o tempo médio e o desvio padrão de entrega por cidade
+
+        Input: Dataframe
+        Output: Dataframe com as colunas City, avg_time e std_time
+    """
+    df_aux = df1.loc[:, ['City', 'Time_taken(min)']].groupby(['City']).agg({'Time_taken(min)' : ['mean', 'std']})
+    df_aux.columns = ['avg_time', 'std_time']
+    df_aux = df_aux.reset_index()
+
+    return df_aux
+
+def ratings_stats( df1, col ):
+    """ Esta funcao tem a responsabilidade de calcular a avaliação média e o desvio padrão dos entregadores por uma coluna
+
+        Input: Dataframe, coluna de agrupamento ( ex.: Road_traffic_density, Weatherconditions )
+        Output: Dataframe com as colunas col, delivery_mean e delivery_std
+    """
+    df_aux = df1.loc[:, ['Delivery_person_Ratings', col]].groupby([col]).agg({'Delivery_person_Ratings' : ['mean', 'std']})
+    df_aux.columns = ['delivery_mean', 'delivery_std']
+    df_aux = df_aux.reset_index()
+
+    return df_aux
+
+def orders_by_traffic( df1 ):
+    """ Esta funcao tem a responsabilidade de agrupar os pedidos por densidade de trânsito e realizar a contagem
+
+        Input: Dataframe
+        Output: Dataframe com as colunas Road_traffic_density e ID ( quantidade de pedidos )
+    """
+    df_aux = df1.loc[:, ['ID', 'Road_traffic_density']].groupby('Road_traffic_density').count().reset_index()
+
+    return df_aux
+
+def orders_by_week( df1 ):
+    """ Esta funcao tem a responsabilidade de contar os pedidos e os entregadores distintos por semana do ano
+
+        A semana segue o '%U' do strftime: começa no domingo, e os dias antes do primeiro domingo do ano são a semana 00.
+
+        Input: Dataframe
+        Output: Dataframe com as colunas week_of_year, ID ( quantidade de pedidos ) e Delivery_person_ID ( entregadores distintos )
+    """
+    df_aux = df1.loc[:, ['ID', 'Delivery_person_ID']].copy()
+    df_aux['week_of_year'] = df1['Order_Date'].dt.strftime( '%U' )
+    df_aux = df_aux.groupby('week_of_year').agg({'ID': 'count', 'Delivery_person_ID': 'nunique'}).reset_index()
+
+    return df_aux
+
+def time_by_city_traffic( df1 ):
+    """ Esta funcao tem a responsabilidade de calcular o tempo médio e o desvio padrão de entrega
+        por cidade e densidade de trânsito
+
+        Input: Dataframe
+        Output: Dataframe com as colunas City, Road_traffic_density, avg_time e std_time
+    """
+    df_aux = ( df1.loc[:, ['City', 'Road_traffic_density','Time_taken(min)']]
+                  .groupby(['City', 'Road_traffic_density'])
+                  .agg({'Time_taken(min)' : ['mean', 'std']}) )
+    df_aux.columns = ['avg_time', 'std_time']
+    df_aux = df_aux.reset_index()
+
+    return df_aux
+
+def unique_delivers( df1 ):
+    """ Esta funcao tem a responsabilidade de contar os entregadores distintos
+
+        Input: Dataframe
+        Output: quantidade de entregadores ( int )
+    """
+    return int( df1['Delivery_person_ID'].nunique() )
+
+def column_range( df1, cols ):
+    """ Esta funcao tem a responsabilidade de calcular o menor e o maior valor de cada coluna
+
+        Input: Dataframe, lista de colunas
+        Output: Dataframe com as linhas min e max e uma coluna para cada coluna pedida ( NaN sem pedidos )
+    """
+    df_aux = df1.loc[:, cols].agg(['min', 'max'])
+
+    return df_aux
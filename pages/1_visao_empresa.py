@@ -11,6 +11,10 @@ from datetime import datetime
 from PIL import Image
 from streamlit_folium import folium_static
 
+from dataset import DATA_PATH, TRAFFIC_OPTIONS
+from refresh import get_store
+from sketches import time_percentiles_graph
+
 st.set_page_config( page_title='Visão Empresa', page_icon='📈', layout='wide')
 
 # ----------------------------------------
@@ -33,62 +37,54 @@ def country_maps( df1 ):
             folium_static(map, width=1024 , height=600 )
             return None
 
-def order_share_by_week( df1 ):
+def order_share_by_week( orders, date_limit, traffic_options ):
     """ Esta funcao tem a responsabilidade agrupar os pedidos do entregador por semana e plotar um gráfico de linhas
 
             Ações:
-            1. Criar coluna semana do ano
-            2. Agrupar os pedidos por semana do ano e realizar a contagem
-            3. Agrupar os pedidos por semana do ano do entregador e realizar a contagem
-            4. Unir dataframes
-            5. Plotar a quantidade de pedidos
+            1. Contar os pedidos e os entregadores distintos por semana do ano ( no backend )
+            2. Dividir os pedidos pelos entregadores
+            3. Plotar a quantidade de pedidos
         
     """
-    df1['week_of_year'] = df1['Order_Date'].dt.strftime( '%U' )
-    df_aux01 = df1.loc[:, ['ID','week_of_year']].groupby('week_of_year').count().reset_index()
-    df_aux02 = df1.loc[:, ['Delivery_person_ID','week_of_year']].groupby('week_of_year').nunique().reset_index()
-    df_aux = pd.merge( df_aux01, df_aux02, how='inner' )
+    df_aux = orders.orders_by_week( date_limit, traffic_options )
     df_aux['order_by_deliver'] = df_aux['ID'] / df_aux['Delivery_person_ID']
     
     fig = px.line(df_aux, x='week_of_year', y='order_by_deliver')
     
     return fig
     
-def order_by_week( df1 ):
+def order_by_week( orders, date_limit, traffic_options ):
     """ Esta funcao tem a responsabilidade agrupar os pedidos por semana e plotar um gráfico de linhas
 
         Ações:
-        1. Criar coluna semana do ano
-        2. Agrupar os pedidos por semana do ano e realizar a contagem
-        3. Plotar a quantidade de pedidos
+        1. Agrupar os pedidos por semana do ano e realizar a contagem ( no backend )
+        2. Plotar a quantidade de pedidos
         
     """
-    # criar a coluna da semana
-    df1['week_of_year'] = df1['Order_Date'].dt.strftime( '%U' )
-    df_aux = df1.loc[:, ['ID', 'week_of_year']].groupby('week_of_year').count().reset_index()
+    df_aux = orders.orders_by_week( date_limit, traffic_options )
     
     fig = px.line( df_aux, x='week_of_year', y='ID' )
     
     return fig
         
-def traffic_order_city( df1 ):
+def traffic_order_city( orders, date_limit, traffic_options ):
     """ Esta funcao tem a responsabilidade de agrupar pedidos por tipo de cidade e densidade de trânsito e plotar um gráfico de dispersão
 
         Ações:
-        1. Agrupar os pedidos por tipo de cidade e densidade do trânsito e realizar a contagem
+        1. Agrupar os pedidos por tipo de cidade e densidade do trânsito e realizar a contagem ( no backend )
         2. Plotar a quantidade de pedidos
         
     """
-    df_aux = df1.loc[:, ['ID', 'City','Road_traffic_density']].groupby(['City','Road_traffic_density']).count().reset_index()
+    df_aux = orders.orders_by_city_traffic( date_limit, traffic_options )
     
     fig = px.scatter(df_aux, x='City', y='Road_traffic_density', size ='ID', color='City')    
     
     return fig
      
-def traffic_order_share(df1):
+def traffic_order_share( orders, date_limit, traffic_options ):
     """ Esta função agrupa pedidos percentualmente por densidade de trânsito e plota um gráfico de pizza. """
 
-    df_aux = df1.loc[:, ['ID', 'Road_traffic_density']].groupby('Road_traffic_density').count().reset_index()
+    df_aux = orders.orders_by_traffic( date_limit, traffic_options )
 
     # Verifica se há dados; se não houver, cria um DataFrame com um valor mínimo para manter o gráfico visível
     if df_aux.empty:
@@ -104,87 +100,35 @@ def traffic_order_share(df1):
 
     return fig
 
-def order_metric( df1 ):
+def order_metric( orders, date_limit, traffic_options ):
     """ Esta funcao tem a responsabilidade de agrupar pedidos por data e plotar um gráfico de barras
 
         Ações:
-        1. Agrupar os pedidos por data e realizar a contagem
+        1. Agrupar os pedidos por data e realizar a contagem ( no backend )
         2. Plotar a quantidade de pedidos
         
     """
-    # colunas
-    cols = ['Order_Date', 'ID']
-    
-    # selecao de linhas
-    df_aux = df1.loc[:, cols].groupby('Order_Date').count().reset_index()
+    # contagem de pedidos por data
+    df_aux = orders.orders_by_date( date_limit, traffic_options )
     
     # desenhar o grafico de linhas
     fig = px.bar(df_aux, x='Order_Date', y='ID')
     
     return fig
     
-def clean_code( df1 ):
-    """" Esta funcao tem a responsabilidade de limpar o dataframe 
-        
-        Tipos de limpeza:
-        1. Remoção dos dados NaN
-        2. Mudança do tipo da coluna de dados
-        3. Remoção dos espaços das variáveis de texto
-        4. Formatação da coluna de datas
-        5. Limpeza da coluna de tempo ( remoção do texto da variável numérica )
-
-        Input: Dataframe
-        Output: Dataframe
-    """
-    #1. convertendo a coluna Age de texto para numero
-    linhas_selecionadas = (df1['Delivery_person_Age'] != 'NaN ')
-    df1 = df1.loc[linhas_selecionadas, :].copy()
-    df1['Delivery_person_Age'] = df1['Delivery_person_Age'].astype( int )
-
-    linhas_selecionadas = (df1['City'] != 'NaN ')
-    df1 = df1.loc[linhas_selecionadas, :].copy()
-    
-    linhas_selecionadas = (df1['Road_traffic_density'] != 'NaN ')
-    df1 = df1.loc[linhas_selecionadas, :].copy()
-    
-    linhas_selecionadas = (df1['Festival'] != 'NaN ')
-    df1 = df1.loc[linhas_selecionadas, :].copy()
-
-    #2. convertendo a coluna Ratings de texto para numero decimal ( float )
-    df1['Delivery_person_Ratings'] = df1['Delivery_person_Ratings'].astype( float )
-    
-    #3. convertendo a coluna order_date de texto para data
-    df1['Order_Date'] = pd.to_datetime(df1['Order_Date'], format = '%d-%m-%Y' )
-    
-    #4. convertendo multiple_deliveries de texto para numero inteiro ( int )
-    linhas_selecionadas = (df1['multiple_deliveries'] != 'NaN ')
-    df1 = df1.loc[linhas_selecionadas, :].copy()
-    df1['multiple_deliveries'] = df1['multiple_deliveries'].astype( int )
-    
-    #6. removendo os espacos dentro de strings/texto/object
-    df1.loc[:, 'ID'] = df1.loc[:, 'ID'].str.strip()
-    df1.loc[:, 'Road_traffic_density'] = df1.loc[:, 'Road_traffic_density'].str.strip()
-    df1.loc[:, 'Type_of_order'] = df1.loc[:, 'Type_of_order'].str.strip()
-    df1.loc[:, 'Type_of_vehicle'] = df1.loc[:, 'Type_of_vehicle'].str.strip()
-    df1.loc[:, 'City'] = df1.loc[:, 'City'].str.strip()
-    df1.loc[:, 'Festival'] = df1.loc[:, 'Festival'].str.strip()
-    
-    #7. Limpando a coluna de time taken
-    df1['Time_taken(min)'] = df1['Time_taken(min)'].apply( lambda x: x.split( '(min)' )[1] )
-    df1['Time_taken(min)'] = df1['Time_taken(min)'].astype(int)
-
-    return df1
     
 # -------------------- Inicio da Estrutura Lógica do Código -----------------------------------
 # --------------------
-#Import dataset
+#Import dataset e limpeza dos dados
 #---------------------
-df = pd.read_csv('train.csv')
+# snapshot atual dos dados, mantido por uma thread de fundo; fica o mesmo até a próxima execução da página
+snapshot = get_store( DATA_PATH ).current()
+if snapshot is None:
+    st.warning( 'Dados indisponíveis no momento. Tente novamente em instantes.' )
+    st.stop()
 
-# --------------------
-# Limpando os dados
-# --------------------
-df1 = clean_code ( df )
+orders = snapshot.orders
+sketches = snapshot.sketches
 
 # ==============================================
 # Barra Lateral
@@ -211,19 +155,15 @@ st.sidebar.markdown("""---""")
 
 traffic_options = st.sidebar.multiselect(
     'Quais as condições do trânsito',
-    ['Low', 'Medium', 'High', 'Jam'],
-    default= ['Low', 'Medium', 'High', 'Jam'])
+    TRAFFIC_OPTIONS,
+    default= TRAFFIC_OPTIONS)
 
 st.sidebar.markdown("""---""")
 st.sidebar.markdown('### Powered by Comunidade DS')
 
-# Filtro de data
-linhas_selecionadas = df1['Order_Date'] < date_slider
-df1 = df1.loc[linhas_selecionadas, :]
-
-# Filtro de trânsito
-linhas_selecionadas = df1['Road_traffic_density'].isin( traffic_options )
-df1 = df1.loc[linhas_selecionadas, :]
+# Filtros de data e trânsito: só as colunas do mapa, o único gráfico calculado na página
+df1 = orders.select( date_slider, traffic_options, ['City', 'Road_traffic_density',
+                                                    'Delivery_location_latitude', 'Delivery_location_longitude'] )
 
 # ==============================================
 # Layout no Streamlit
@@ -233,7 +173,7 @@ tab1, tab2, tab3 = st.tabs(['Visão Gerencial', 'Visão Tática', 'Visão Geogr
 with tab1:
     with st.container():
         # Order Metric
-        fig = order_metric( df1 )
+        fig = order_metric( orders, date_slider, traffic_options )
         st.markdown( '# Pedidos por dia' )
         st.plotly_chart( fig, use_container_width=True )
         
@@ -242,24 +182,29 @@ with tab1:
         col1, col2 = st.columns( 2 )
         
         with col1:
-            fig = traffic_order_share( df1 )
+            fig = traffic_order_share( orders, date_slider, traffic_options )
             st.markdown('## Percentual de pedidos por trânsito')
             st.plotly_chart( fig, use_container_width=True )
 
         with col2:
-            fig = traffic_order_city( df1 )
+            fig = traffic_order_city( orders, date_slider, traffic_options )
             st.markdown('## Pedidos por cidade e trânsito')
             st.plotly_chart( fig, use_container_width=True )
+
+    with st.container():
+        fig = time_percentiles_graph( sketches, date_slider, traffic_options, by='Road_traffic_density' )
+        st.markdown('## Percentis do tempo de entrega por trânsito')
+        st.plotly_chart( fig, use_container_width=True )
                
 with tab2:
         with st.container():
             st.markdown( "# Média de pedidos por semana anual")
-            fig = order_by_week( df1 )
+            fig = order_by_week( orders, date_slider, traffic_options )
             st.plotly_chart( fig, use_container_width=True )
             
         with st.container():
             st.markdown('# Média de pedidos do entregador por semana anual')
-            fig = order_share_by_week( df1 )
+            fig = order_share_by_week( orders, date_slider, traffic_options )
             st.plotly_chart(fig, use_container_width=True)
         
 with tab3:
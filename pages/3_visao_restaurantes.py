@@ -12,47 +12,41 @@ from datetime import datetime
 from PIL import Image
 from streamlit_folium import folium_static
 
+from dataset import DATA_PATH, TRAFFIC_OPTIONS
+from paging import PagedTable, paged_dataframe
+from refresh import get_store
+from sketches import merge_sketches, sketch_quantiles, time_percentiles_graph
+
 st.set_page_config( page_title='Visão Restaurantes', page_icon='🍴', layout='wide')
 
 
 # ----------------------------------------
 # Funções
 # ---------------------------------------
-def avg_std_time_on_traffic( df1 ):
+def avg_std_time_on_traffic( orders, date_limit, traffic_options ):
     """ Esta funcao tem a responsabilidade de calcular o tempo médio e o STD das entregas e plotar um gráfico
 
         Passos:
-        1. Seleção das colunas
-        2. Agrupamento
-        3. Aplicação da função
-        4. Plotagem do gráfico
+        1. Tempo médio e desvio padrão por cidade e trânsito ( no backend )
+        2. Plotagem do gráfico
         
     """
-    df_aux = ( df1.loc[:, ['City', 'Road_traffic_density','Time_taken(min)']]
-                  .groupby(['City', 'Road_traffic_density'])
-                  .agg({'Time_taken(min)' : ['mean', 'std']}) )
-    
-    df_aux.columns = ['avg_time', 'std_time']
-    df_aux = df_aux.reset_index()
+    df_aux = orders.time_by_city_traffic( date_limit, traffic_options )
     fig = px.sunburst(df_aux, path=['City', 'Road_traffic_density'], values='avg_time',
     color='std_time', color_continuous_scale='RdBu',
     color_continuous_midpoint=np.average(df_aux['std_time']))
     
     return fig
     
-def avg_std_time_graph( df1 ):
+def avg_std_time_graph( orders, date_limit, traffic_options ):
     """ Esta funcao tem a responsabilidade de calcular o tempo médio e o STD das entregas e plotar um gráfico
 
         Passos:
-        1. Seleção das colunas
-        2. Agrupamento
-        3. Aplicação da função
-        4. Plotagem do gráfico
+        1. Agrupamento por cidade e aplicação da função ( no backend )
+        2. Plotagem do gráfico
         
     """
-    df_aux = df1.loc[:, ['City', 'Time_taken(min)']].groupby(['City']).agg({'Time_taken(min)' : ['mean', 'std']})
-    df_aux.columns = ['avg_time', 'std_time']
-    df_aux = df_aux.reset_index()
+    df_aux = orders.time_by_city( date_limit, traffic_options )
     
     fig = go.Figure()
     fig.add_trace( go.Bar( name='Control',
@@ -63,26 +57,20 @@ def avg_std_time_graph( df1 ):
     
     return fig
     
-def avg_std_time_delivery( df1, festival, op):
+def avg_std_time_delivery( df_festival, festival, op):
     """
-        Esta função calcula o tempo médio e o desvio padrão do tempo de entrega.
+        Esta função seleciona o tempo médio ou o desvio padrão do tempo de entrega com ou sem festival.
         Parâmetros:
             Input:
-                - df: Dataframe com os dados necessários para o cálculo
+                - df_festival: Tempo médio e desvio padrão por Festival, calculados pelo backend
                 - op: Tipo de operação que precisa ser calculado
                     'avg_time': Calcula o tempo médio
                     'std_time': Calcula o desvio padrão do tempo
     """
-    if df1.empty:
+    if df_festival.empty:
         st.warning("Sem dados para os filtros selecionados.")
     else:
-        df_aux = ( df1.loc[:, ['Festival', 'Time_taken(min)']]
-                                    .groupby('Festival')
-                                    .agg({'Time_taken(min)' : ['mean', 'std']} ) )
-        
-        df_aux.columns = ['avg_time', 'std_time']
-        df_aux = df_aux.reset_index()
-        df_aux = np.round(df_aux.loc[df_aux['Festival'] == festival, op], 2)
+        df_aux = np.round(df_festival.loc[df_festival['Festival'] == festival, op], 2)
         
         return df_aux
                 
@@ -115,65 +103,26 @@ def distance( df1, fig ):
 
         return fig
 
-def clean_code( df1 ):
-    """" Esta funcao tem a responsabilidade de limpar o dataframe 
-        
-        Tipos de limpeza:
-        1. Remoção dos dados NaN
-        2. Mudança do tipo da coluna de dados
-        3. Remoção dos espaços das variáveis de texto
-        4. Formatação da coluna de datas
-        5. Limpeza da coluna de tempo ( remoção do texto da variável numérica )
-
-        Input: Dataframe
-        Output: Dataframe
-    """
-    #1. convertendo a coluna Age de texto para numero
-    linhas_selecionadas = (df1['Delivery_person_Age'] != 'NaN ')
-    df1 = df1.loc[linhas_selecionadas, :].copy()
-    df1['Delivery_person_Age'] = df1['Delivery_person_Age'].astype( int )
+@st.cache_resource( max_entries=32 )
+def time_by_city_order_type_table( _orders, version, date_limit, traffic_options ):
+    """ Esta funcao tem a responsabilidade de montar a tabela paginada de tempo de entrega por cidade e tipo de pedido
 
-    linhas_selecionadas = (df1['City'] != 'NaN ')
-    df1 = df1.loc[linhas_selecionadas, :].copy()
-    
-    linhas_selecionadas = (df1['Road_traffic_density'] != 'NaN ')
-    df1 = df1.loc[linhas_selecionadas, :].copy()
-    
-    linhas_selecionadas = (df1['Festival'] != 'NaN ')
-    df1 = df1.loc[linhas_selecionadas, :].copy()
+        A tabela e os índices de ordenação são calculados uma vez para cada versão dos dados e combinação de filtros.
+    """
+    return PagedTable( _orders.time_by_city_order_type( date_limit, traffic_options ), search_col='City' )
 
-    #2. convertendo a coluna Ratings de texto para numero decimal ( float )
-    df1['Delivery_person_Ratings'] = df1['Delivery_person_Ratings'].astype( float )
-    
-    #3. convertendo a coluna order_date de texto para data
-    df1['Order_Date'] = pd.to_datetime(df1['Order_Date'], format = '%d-%m-%Y' )
-    
-    #4. convertendo multiple_deliveries de texto para numero inteiro ( int )
-    linhas_selecionadas = (df1['multiple_deliveries'] != 'NaN ')
-    df1 = df1.loc[linhas_selecionadas, :].copy()
-    df1['multiple_deliveries'] = df1['multiple_deliveries'].astype( int )
-    
-    #6. removendo os espacos dentro de strings/texto/object
-    df1.loc[:, 'ID'] = df1.loc[:, 'ID'].str.strip()
-    df1.loc[:, 'Road_traffic_density'] = df1.loc[:, 'Road_traffic_density'].str.strip()
-    df1.loc[:, 'Type_of_order'] = df1.loc[:, 'Type_of_order'].str.strip()
-    df1.loc[:, 'Type_of_vehicle'] = df1.loc[:, 'Type_of_vehicle'].str.strip()
-    df1.loc[:, 'City'] = df1.loc[:, 'City'].str.strip()
-    df1.loc[:, 'Festival'] = df1.loc[:, 'Festival'].str.strip()
-    
-    #7. Limpando a coluna de time taken
-    df1['Time_taken(min)'] = df1['Time_taken(min)'].apply( lambda x: x.split( '(min)' )[1] )
-    df1['Time_taken(min)'] = df1['Time_taken(min)'].astype(int)
-    
-    return df1
 
 # ----------------------------
-#Import dataset
+#Import dataset and cleaning code
 # ----------------------------
-df = pd.read_csv('train.csv')
+# snapshot atual dos dados, mantido por uma thread de fundo; fica o mesmo até a próxima execução da página
+snapshot = get_store( DATA_PATH ).current()
+if snapshot is None:
+    st.warning( 'Dados indisponíveis no momento. Tente novamente em instantes.' )
+    st.stop()
 
-# Cleaning code
-df1 = clean_code( df )
+orders = snapshot.orders
+sketches = snapshot.sketches
 
 
 # ==============================================
@@ -202,19 +151,16 @@ st.sidebar.markdown("""---""")
 
 traffic_options = st.sidebar.multiselect(
     'Quais as condições do trânsito',
-    ['Low', 'Medium', 'High', 'Jam'],
-    default= ['Low', 'Medium', 'High', 'Jam'])
+    TRAFFIC_OPTIONS,
+    default= TRAFFIC_OPTIONS)
 
 st.sidebar.markdown("""---""")
 st.sidebar.markdown('### Powered by Comunidade DS')
 
-# Filtro de data
-linhas_selecionadas = df1['Order_Date'] < date_slider
-df1 = df1.loc[linhas_selecionadas, :]
-
-# Filtro de trânsito
-linhas_selecionadas = df1['Road_traffic_density'].isin( traffic_options )
-df1 = df1.loc[linhas_selecionadas, :]
+# Filtros de data e trânsito: só as colunas usadas pelos gráficos calculados na página
+df1 = orders.select( date_slider, traffic_options, ['City', 'Restaurant_latitude', 'Restaurant_longitude',
+                                                    'Delivery_location_latitude', 'Delivery_location_longitude'] )
+df_festival = orders.festival_time_stats( date_slider, traffic_options )
 
 # ==============================================
 # Layout no Streamlit
@@ -227,7 +173,7 @@ with tab1:
     
         col1, col2, col3, col4, col5, col6 = st.columns( 6 )
         with col1:
-            delivery_count = df1['Delivery_person_ID'].nunique()
+            delivery_count = orders.unique_delivers( date_slider, traffic_options )
             col1.metric('Entregadores únicos', delivery_count)
     
         with col2:
@@ -235,19 +181,19 @@ with tab1:
             col2.metric('Distância média das entregas', avg_distance)
             
         with col3:
-            df_aux = avg_std_time_delivery( df1, 'Yes', 'avg_time')
+            df_aux = avg_std_time_delivery( df_festival, 'Yes', 'avg_time')
             col3.metric('Tempo Médio C/ Festival', df_aux)
     
         with col4:
-              df_aux = avg_std_time_delivery( df1, 'Yes', 'std_time')
+              df_aux = avg_std_time_delivery( df_festival, 'Yes', 'std_time')
               col4.metric('STD Entrega C/ Festival', df_aux)
     
         with col5:
-            df_aux = avg_std_time_delivery( df1, 'No', 'avg_time')
+            df_aux = avg_std_time_delivery( df_festival, 'No', 'avg_time')
             col5.metric('Tempo Médio S/ Festival', df_aux)
             
         with col6:
-            df_aux = avg_std_time_delivery( df1, 'No', 'std_time')
+            df_aux = avg_std_time_delivery( df_festival, 'No', 'std_time')
             col6.metric('STD Entrega S/ Festival', df_aux)
     
     with st.container():
@@ -255,18 +201,14 @@ with tab1:
         col1, col2 = st.columns( 2 )
         
         with col1:
-            fig = avg_std_time_graph( df1 )
+            fig = avg_std_time_graph( orders, date_slider, traffic_options )
             st.markdown("##### Média de tempo de entrega e STD por tipo de cidade")
             st.plotly_chart( fig )
         
         with col2:
             st.markdown("##### Média de tempo de entrega e STD por tipo de pedido e cidade")
-            df_aux = ( df1.loc[:, ['City', 'Type_of_order','Time_taken(min)']]
-                          .groupby(['City', 'Type_of_order'])
-                          .agg({'Time_taken(min)' : ['mean', 'std']} ) )
-            df_aux.columns = ['avg_time', 'std_time']
-            df_aux = df_aux.reset_index()
-            st.dataframe(df_aux)
+            table = time_by_city_order_type_table( orders, snapshot.version, date_slider, traffic_options )
+            paged_dataframe( table, key='time_by_city_order_type', page_size=10 )
     
     with st.container():
         st.markdown("""___""")
@@ -280,6 +222,31 @@ with tab1:
             st.plotly_chart( fig )
     
         with col2:   
-            fig = avg_std_time_on_traffic( df1 )  
+            fig = avg_std_time_on_traffic( orders, date_slider, traffic_options )  
             st.markdown("##### Percentual de tempo de entrega e STD por trânsito e cidade")
             st.plotly_chart( fig )
+
+    with st.container():
+        st.markdown("""___""")
+        st.title('Percentis do Tempo de Entrega')
+
+        df_aux = sketch_quantiles( merge_sketches( sketches, date_slider, traffic_options ) )
+        if df_aux['orders'].iloc[0] == 0:
+            st.warning("Sem dados para os filtros selecionados.")
+        else:
+            col1, col2, col3 = st.columns( 3 )
+            col1.metric('P50 do tempo de entrega', df_aux['p50'].iloc[0])
+            col2.metric('P90 do tempo de entrega', df_aux['p90'].iloc[0])
+            col3.metric('P99 do tempo de entrega', df_aux['p99'].iloc[0])
+
+        col1, col2 = st.columns( 2 )
+
+        with col1:
+            fig = time_percentiles_graph( sketches, date_slider, traffic_options, by='City' )
+            st.markdown("##### Percentis do tempo de entrega por cidade")
+            st.plotly_chart( fig )
+
+        with col2:
+            fig = time_percentiles_graph( sketches, date_slider, traffic_options, by='Festival' )
+            st.markdown("##### Percentis do tempo de entrega com e sem festival")
+            st.plotly_chart( fig )
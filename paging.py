@@ -0,0 +1,96 @@
+# Libraries
+import math
+
+import numpy as np
+import streamlit as st
+
+# ----------------------------------------
+# Tabela paginada no servidor
+# ---------------------------------------
+# Em vez de enviar a tabela inteira para o navegador, a ordenação e a busca acontecem aqui e só as
+# linhas da página visível vão para o st.dataframe.
+
+PAGE_SIZE = 20
+
+
+class PagedTable:
+    """ Tabela agregada com índices de ordenação pré-calculados para todas as colunas
+
+        - Ordenação: para cada coluna guarda a ordem das linhas crescente e decrescente ( nulos no fim )
+        - Busca: guarda os valores da coluna de busca ordenados, e a busca por prefixo vira um
+          intervalo encontrado com busca binária
+    """
+
+    def __init__( self, df, search_col ):
+        self.df = df.reset_index( drop=True )
+        self.search_col = search_col
+        self.columns = list( self.df.columns )
+
+        self._order = {}
+        for col in self.columns:
+            asc = self.df[col].sort_values( ascending=True, na_position='last', kind='stable' ).index.to_numpy()
+            desc = self.df[col].sort_values( ascending=False, na_position='last', kind='stable' ).index.to_numpy()
+            self._order[col] = ( asc, desc )
+
+        keys = self.df[search_col].astype( str ).str.strip().str.upper().to_numpy()
+        self._key_order = np.argsort( keys, kind='stable' )
+        self._keys = keys[self._key_order]
+
+    def __len__( self ):
+        return len( self.df )
+
+    def search( self, prefix ):
+        """ Esta funcao tem a responsabilidade de encontrar as linhas cujo valor de busca começa com o prefixo
+
+            Input: prefixo ( sem diferenciar maiúsculas e minúsculas )
+            Output: array com as posições das linhas encontradas
+        """
+        prefix = prefix.strip().upper()
+        start = np.searchsorted( self._keys, prefix, side='left' )
+        end = np.searchsorted( self._keys, prefix + '\U0010ffff', side='left' )
+
+        return self._key_order[start:end]
+
+    def page( self, sort_col, ascending=True, prefix='', page=1, page_size=PAGE_SIZE ):
+        """ Esta funcao tem a responsabilidade de devolver uma página da tabela já ordenada e filtrada
+
+            Input: coluna de ordenação, sentido, prefixo de busca, número da página ( a partir de 1 ), tamanho da página
+            Output: Dataframe com as linhas da página, total de linhas encontradas
+        """
+        order = self._order[sort_col][0 if ascending else 1]
+
+        if prefix.strip():
+            mask = np.zeros( len( self.df ), dtype=bool )
+            mask[self.search( prefix )] = True
+            order = order[mask[order]]
+
+        start = ( page - 1 ) * page_size
+        rows = order[start:start + page_size]
+
+        return self.df.iloc[rows], len( order )
+
+
+def paged_dataframe( table, key, page_size=PAGE_SIZE ):
+    """ Esta funcao tem a responsabilidade de exibir a tabela paginada com os controles de ordenação, busca e página
+
+        Input: PagedTable, chave única dos widgets na página, tamanho da página
+    """
+    col1, col2, col3, col4 = st.columns( [3, 2, 3, 2] )
+
+    sort_col = col1.selectbox( 'Ordenar por', table.columns, key=key + '_sort' )
+    direction = col2.selectbox( 'Ordem', ['Crescente', 'Decrescente'], key=key + '_dir' )
+    prefix = col3.text_input( 'Buscar {}'.format( table.search_col ), key=key + '_search' )
+
+    total = len( table.search( prefix ) ) if prefix.strip() else len( table )
+    n_pages = max( 1, math.ceil( total / page_size ) )
+
+    # a busca pode reduzir o número de páginas; mantém a página escolhida dentro do limite
+    page_key = key + '_page'
+    if st.session_state.get( page_key, 1 ) > n_pages:
+        st.session_state[page_key] = n_pages
+
+    page = col4.number_input( 'Página', min_value=1, max_value=n_pages, step=1, key=page_key )
+
+    df_page, total = table.page( sort_col, direction == 'Crescente', prefix, int( page ), page_size )
+    st.dataframe( df_page, hide_index=True, use_container_width=True )
+    st.caption( 'Página {} de {} ( {} registros )'.format( int( page ), n_pages, total ) )
@@ -0,0 +1,214 @@
+# Libraries
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from backends import open_backend, open_stored
+from dataset import DATA_PATH, dataset_version, load_dataset
+from sketches import SKETCH_KEYS, build_time_sketches
+
+logger = logging.getLogger( __name__ )
+
+# Intervalo ( em segundos ) entre as verificações do arquivo de dados
+REFRESH_INTERVAL = float( os.environ.get( 'CURRY_REFRESH_INTERVAL', '10' ) )
+
+# Espera máxima ( em segundos ) entre novas tentativas depois de um erro que não é do arquivo
+MAX_RETRY_DELAY = 300
+
+# Tempo ( em segundos ) que um snapshot substituído continua aberto para as execuções em andamento
+RETIRE_GRACE = float( os.environ.get( 'CURRY_RETIRE_GRACE', '600' ) )
+
+# Colunas que as páginas usam e que precisam existir em toda nova versão
+REQUIRED_COLUMNS = ['ID', 'Delivery_person_ID', 'Delivery_person_Age', 'Delivery_person_Ratings',
+                    'Restaurant_latitude', 'Restaurant_longitude', 'Delivery_location_latitude',
+                    'Delivery_location_longitude', 'Order_Date', 'Weatherconditions',
+                    'Road_traffic_density', 'Vehicle_condition', 'Type_of_order', 'Festival', 'City',
+                    'Time_taken(min)']
+
+
+class Snapshot:
+    """ Versão imutável dos dados servida às páginas: backend de consulta dos pedidos e agregados derivados """
+
+    def __init__( self, version, orders, sketches ):
+        self.version = version
+        self.orders = orders
+        self.sketches = sketches
+        self.loaded_at = datetime.now()
+
+
+def validate_orders( df1 ):
+    """ Esta funcao tem a responsabilidade de conferir se o dataset limpo pode substituir a versão atual
+
+        Input: Dataframe limpo
+        Erros: ValueError com o motivo da recusa
+    """
+    missing = [c for c in REQUIRED_COLUMNS if c not in df1.columns]
+    if missing:
+        raise ValueError( 'colunas ausentes: {}'.format( ', '.join( missing ) ) )
+
+    if df1.empty:
+        raise ValueError( 'nenhum pedido após a limpeza' )
+
+    if df1['Order_Date'].isna().any() or df1['Time_taken(min)'].isna().any():
+        raise ValueError( 'datas ou tempos de entrega vazios' )
+
+def build_snapshot( path, version ):
+    """ Esta funcao tem a responsabilidade de ler, limpar, validar e agregar uma nova versão dos dados
+
+        Quando outro processo ( ou uma execução anterior ) já gravou as partições desta versão, elas
+        são abertas direto, sem ler e limpar o csv de novo: a versão já passou pela validação antes de
+        ser gravada, e os histogramas saem só das colunas que eles usam.
+
+        Input: caminho do csv, versão do arquivo
+        Output: Snapshot
+        Erros: ValueError quando o arquivo não passa na limpeza ou na validação; os demais erros
+               ( ex.: OSError ) são repassados como vieram
+    """
+    orders = open_stored( version )
+    if orders is not None:
+        return Snapshot( version, orders, build_time_sketches( orders.read_all( SKETCH_KEYS + ['Time_taken(min)'] ) ) )
+
+    try:
+        df1 = load_dataset( path )
+    except ( KeyError, TypeError ) as e:
+        # coluna ausente ou valor que a limpeza não converte: o problema é do arquivo
+        raise ValueError( 'falha na limpeza: {!r}'.format( e ) ) from e
+
+    validate_orders( df1 )
+
+    # o arquivo mudou durante a leitura ( cópia em andamento ): descarta e tenta de novo depois
+    if dataset_version( path ) != version:
+        raise ValueError( 'arquivo alterado durante a leitura' )
+
+    return Snapshot( version, open_backend( df1, version ), build_time_sketches( df1 ) )
+
+
+class SnapshotStore:
+    """ Mantém o snapshot atual e o atualiza em uma thread de fundo
+
+        Só a primeira carga acontece na thread de quem criou o store. Depois disso, a thread de fundo
+        verifica o arquivo a cada intervalo e só reconstrói quando a versão fica igual por duas
+        verificações seguidas, para não ler um arquivo no meio de uma cópia. O novo snapshot
+        substitui o anterior em uma única atribuição; quem já pegou o snapshot antigo continua
+        usando ele até a próxima execução da página, e ele só é fechado depois de RETIRE_GRACE.
+
+        Uma versão recusada pela validação ou limpeza ( ValueError ) só é tentada de novo quando o
+        arquivo muda. Qualquer outro erro ( disco cheio, permissão, corrida ) é tentado de novo com
+        espera crescente até MAX_RETRY_DELAY.
+    """
+
+    def __init__( self, path=DATA_PATH, interval=REFRESH_INTERVAL, grace=RETIRE_GRACE ):
+        self.path = path
+        self.interval = interval
+        self.grace = grace
+        self._snapshot = None
+        self._retired = []
+        self._seen = None
+        self._failed = None
+        self._retry_at = 0.0
+        self._retry_delay = interval
+        self._thread = None
+
+    def current( self ):
+        return self._snapshot
+
+    def start( self ):
+        try:
+            version = dataset_version( self.path )
+            self._refresh( version )
+        except OSError as e:
+            logger.warning( 'dataset indisponível: %s', e )
+
+        self._thread = threading.Thread( target=self._run, name='curry-refresh', daemon=True )
+        self._thread.start()
+
+        return self
+
+    def _run( self ):
+        while True:
+            time.sleep( self.interval )
+            try:
+                self.poll()
+            except Exception:
+                logger.exception( 'erro inesperado ao atualizar os dados' )
+
+    def poll( self ):
+        """ Verifica o arquivo uma vez e reconstrói o snapshot se houver uma versão nova e estável """
+        self.close_retired()
+        self.touch()
+
+        try:
+            version = dataset_version( self.path )
+        except OSError:
+            return
+
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return
+
+        # espera a versão se repetir na próxima verificação antes de ler; uma versão nova recomeça as tentativas
+        if version != self._seen:
+            self._seen = version
+            self._retry_at = 0.0
+            self._retry_delay = self.interval
+            return
+
+        if version != self._failed and time.monotonic() >= self._retry_at:
+            self._refresh( version )
+
+    def _refresh( self, version ):
+        try:
+            snapshot = build_snapshot( self.path, version )
+        except ValueError as e:
+            # problema no próprio arquivo: só vale tentar de novo quando ele mudar
+            self._failed = version
+            logger.warning( 'nova versão do dataset recusada ( %s ): %s', version, e )
+            return
+        except Exception as e:
+            self._retry_at = time.monotonic() + self._retry_delay
+            logger.warning( 'erro ao carregar a versão %s, nova tentativa em %.0fs: %s', version, self._retry_delay, e )
+            self._retry_delay = min( self._retry_delay * 2, MAX_RETRY_DELAY )
+            return
+
+        # o snapshot anterior continua aberto para as execuções em andamento até passar o RETIRE_GRACE
+        if self._snapshot is not None:
+            self._retired.append( ( self._snapshot, time.monotonic() ) )
+        self._snapshot = snapshot
+        self._seen = version
+        self._retry_at = 0.0
+        self._retry_delay = self.interval
+        logger.info( 'dataset atualizado para a versão %s ( %d pedidos )', version, len( snapshot.orders ) )
+
+    def touch( self ):
+        """ Marca como em uso os dados do snapshot atual e dos substituídos que ainda estão abertos """
+        snapshots = [snapshot for snapshot, _ in self._retired] + [self._snapshot]
+        for snapshot in snapshots:
+            if snapshot is not None:
+                snapshot.orders.touch()
+
+    def close_retired( self ):
+        """ Libera os recursos dos snapshots substituídos há mais de RETIRE_GRACE segundos """
+        now = time.monotonic()
+        expired = [snapshot for snapshot, retired_at in self._retired if now - retired_at >= self.grace]
+        self._retired = [( snapshot, retired_at ) for snapshot, retired_at in self._retired if now - retired_at < self.grace]
+
+        for snapshot in expired:
+            snapshot.orders.close()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_store( path=DATA_PATH ):
+    """ Esta funcao tem a responsabilidade de devolver o store do processo, criando e iniciando na primeira chamada
+
+        Input: caminho do csv
+        Output: SnapshotStore
+    """
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = SnapshotStore( path ).start()
+
+        return _stores[path]
@@ -0,0 +1,90 @@
+# Libraries
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+# ----------------------------------------
+# Histogramas de tempo de entrega ( sketches de percentis )
+# ---------------------------------------
+# O tempo de entrega é um número inteiro de minutos, então um histograma com uma coluna por minuto
+# guarda a distribuição completa de cada célula Data x Cidade x Trânsito x Festival. Juntar células
+# é só somar as contagens, e os percentis saem da soma acumulada, sem ordenar as linhas originais.
+
+SKETCH_KEYS = ['Order_Date', 'City', 'Road_traffic_density', 'Festival']
+
+PERCENTILES = [0.5, 0.9, 0.99]
+
+
+def build_time_sketches( df1 ):
+    """ Esta funcao tem a responsabilidade de montar os histogramas de tempo de entrega por célula
+
+        Input: Dataframe limpo ( sem filtros )
+        Output: Dataframe indexado por Order_Date, City, Road_traffic_density e Festival,
+                com uma coluna por minuto ( 0 até o maior tempo ) contendo a quantidade de pedidos
+    """
+    minutes = np.arange( df1['Time_taken(min)'].max() + 1 if not df1.empty else 1 )
+
+    sketches = ( df1.loc[:, SKETCH_KEYS + ['Time_taken(min)']]
+                    .groupby( SKETCH_KEYS + ['Time_taken(min)'] )
+                    .size()
+                    .unstack( 'Time_taken(min)', fill_value=0 )
+                    .reindex( columns=minutes, fill_value=0 ) )
+
+    return sketches
+
+def merge_sketches( sketches, date_limit, traffic_options, by=None ):
+    """ Esta funcao tem a responsabilidade de juntar os histogramas das células selecionadas pelos filtros
+
+        Input: histogramas, data limite, lista de condições de trânsito,
+               by: coluna(s) de SKETCH_KEYS usadas para separar o resultado ( None junta tudo )
+        Output: Dataframe com um histograma por grupo ( ou uma única linha 'Total' )
+    """
+    dates = sketches.index.get_level_values( 'Order_Date' )
+    traffic = sketches.index.get_level_values( 'Road_traffic_density' )
+    df_aux = sketches.loc[( dates < date_limit ) & traffic.isin( traffic_options ), :]
+
+    if by is None:
+        return df_aux.sum().to_frame( 'Total' ).T
+
+    return df_aux.groupby( level=by ).sum()
+
+def sketch_quantiles( hists, percentiles=PERCENTILES ):
+    """ Esta funcao tem a responsabilidade de calcular os percentis a partir dos histogramas
+
+        O percentil q é o menor minuto cuja contagem acumulada alcança q do total de pedidos.
+
+        Input: Dataframe de histogramas ( uma linha por grupo ), lista de percentis
+        Output: Dataframe com uma coluna por percentil ( p50, p90, p99 ) e o total de pedidos
+    """
+    counts = hists.to_numpy()
+    cumsum = counts.cumsum( axis=1 )
+    total = cumsum[:, -1] if counts.size else np.zeros( len( hists ), dtype=int )
+
+    df_aux = pd.DataFrame( index=hists.index )
+    for q in percentiles:
+        idx = ( cumsum < ( q * total )[:, None] ).sum( axis=1 )
+        values = hists.columns.to_numpy()[np.minimum( idx, len( hists.columns ) - 1 )] if counts.size else idx
+        df_aux['p{}'.format( int( round( q * 100 ) ) )] = np.where( total > 0, values, np.nan )
+
+    df_aux['orders'] = total
+
+    return df_aux
+
+def time_percentiles( sketches, date_limit, traffic_options, by ):
+    """ Esta funcao tem a responsabilidade de calcular os percentis do tempo de entrega por grupo, prontos para o gráfico
+
+        Input: histogramas, data limite, lista de condições de trânsito, coluna de SKETCH_KEYS usada no agrupamento
+        Output: Dataframe longo com as colunas by, percentil ( p50, p90, p99 ) e Time_taken(min)
+    """
+    df_aux = sketch_quantiles( merge_sketches( sketches, date_limit, traffic_options, by=by ) )
+    df_aux = df_aux.drop( columns='orders' ).reset_index().melt( id_vars=by, var_name='percentil', value_name='Time_taken(min)' )
+
+    return df_aux
+
+def time_percentiles_graph( sketches, date_limit, traffic_options, by ):
+    """ Esta funcao tem a responsabilidade de plotar os percentis do tempo de entrega lado a lado para cada grupo """
+    df_aux = time_percentiles( sketches, date_limit, traffic_options, by )
+
+    fig = px.bar( df_aux, x=by, y='Time_taken(min)', color='percentil', barmode='group' )
+
+    return fig